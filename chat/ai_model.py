@@ -1,17 +1,48 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+# chat/ai_model.py
+#
+# The local phi-3 model, loaded on first use rather than at import: Celery
+# task discovery imports this module in every worker, web process and beat,
+# and only the ai queue worker ever generates text.
+#
+# The ai worker runs its tasks in threads (see chat/batching.py) and loads it
+# once when it starts (see warm_up() and config/celery.py), so the first
+# question does not wait for the weights.
+
+import threading
 
 MODEL_NAME = "microsoft/phi-3-mini-4k-instruct"
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+_loaded = None  # (tokenizer, model)
+_lock = threading.Lock()
+
+
+def get_model():
+    """The shared (tokenizer, model), loading it if this process has none yet."""
+    global _loaded
+    if _loaded is None:
+        with _lock:
+            if _loaded is None:
+                import torch
+                from transformers import AutoTokenizer, AutoModelForCausalLM
+
+                tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+                if tokenizer.pad_token is None:
+                    tokenizer.pad_token = tokenizer.eos_token
+                tokenizer.padding_side = "left"  # batched prompts must end where replies start
+                model = AutoModelForCausalLM.from_pretrained(
+                    MODEL_NAME,
+                    torch_dtype=torch.float32,
+                    device_map="auto",
+                    low_cpu_mem_usage=True,  # no second full copy while loading
+                )
+                model.eval()
+                _loaded = tokenizer, model
+    return _loaded
 
-model = AutoModelForCausalLM.from_pretrained(
-    MODEL_NAME,
-    torch_dtype=torch.float32,
-    device_map="auto"
-)
 
-model.eval()
+def warm_up():
+    """Load the weights now, called when the ai worker starts."""
+    get_model()
 
 
 def format_messages(messages):
@@ -28,10 +59,18 @@ def format_messages(messages):
     return prompt
 
 
-def generate_reply(messages, max_new_tokens=256):
-    prompt = format_messages(messages)
+def generate_batch(conversations, max_new_tokens=256, do_sample=True):
+    """
+    One reply per conversation from a single generate() call. Prompts are
+    left padded, so every row ends where its reply starts, and the
+    attention mask keeps the padding out. Returns (replies, new token
+    counts).
+    """
+    import torch
 
-    inputs = tokenizer(prompt, return_tensors="pt")
+    tokenizer, model = get_model()
+    prompts = [format_messages(messages) for messages in conversations]
+    inputs = tokenizer(prompts, return_tensors="pt", padding=True)
 
     with torch.no_grad():
         output = model.generate(
@@ -39,10 +78,17 @@ def generate_reply(messages, max_new_tokens=256):
             max_new_tokens=max_new_tokens,
             temperature=0.7,
             top_p=0.9,
-            do_sample=True,
+            do_sample=do_sample,
+            pad_token_id=tokenizer.pad_token_id,
         )
 
-    decoded = tokenizer.decode(output[0], skip_special_tokens=True)
+    # drop the prompt, keep only what was generated
+    generated = output[:, inputs["input_ids"].shape[1]:]
+    replies = [text.strip() for text in tokenizer.batch_decode(generated, skip_special_tokens=True)]
+    counts = (generated != tokenizer.pad_token_id).sum(dim=1).tolist()
+    return replies, counts
+
 
-    # return only the assistant reply
-    return decoded.split("<|assistant|>")[-1].strip()
+def generate_reply(messages, max_new_tokens=256):
+    replies, _ = generate_batch([messages], max_new_tokens)
+    return replies[0]
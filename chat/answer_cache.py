@@ -0,0 +1,211 @@
+# chat/answer_cache.py
+#
+# Answers to questions asked before, in two levels:
+#
+#   exact     the normalized question text, in the shared cache (all workers)
+#   semantic  a question that means the same, by sentence embedding, kept in
+#             this process: a NumPy matrix with one row per question
+#
+# Both only hold answers of the current LLM_MODEL. Hit counters live in the
+# shared cache, see metrics() and the answer_cache_stats command. The cache is
+# an optimisation only: when it fails, the question goes to the model.
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+METRIC_KEYS = {level: f"chat:answers:{level}" for level in ("exact", "semantic", "miss")}
+
+Lookup = namedtuple("Lookup", "answer level embedding")
+
+_space = re.compile(r"\s+")
+_numbers = re.compile(r"\d+(?:\.\d+)?")
+_words = re.compile(r"[a-z']+")
+
+# Words that turn a question into its opposite ("with/without alcohol", "safe/
+# not safe in pregnancy"). Embeddings barely tell such pairs apart.
+NEGATIONS = frozenset({
+    "no", "not", "never", "none", "without", "cannot", "avoid", "unsafe",
+    "contraindicated", "except", "instead", "stop", "non",
+})
+
+
+def normalize(question):
+    return _space.sub(" ", question.lower()).strip(" ?!.")
+
+
+def _guard(question):
+    """What two questions must share besides their meaning: numbers and negations."""
+    words = _words.findall(question.lower())
+    negations = {"not" if word.endswith("n't") else word for word in words}
+    return tuple(_numbers.findall(question)), frozenset(negations & (NEGATIONS | {"not"}))
+
+
+def _exact_key(question):
+    digest = hashlib.sha1(f"{settings.LLM_MODEL}\n{normalize(question)}".encode()).hexdigest()
+    return f"chat:answer:{digest}"
+
+
+class SemanticCache:
+    """
+    Fixed size store of (unit length embedding, answer). A lookup is one
+    matrix-vector product; the least recently used row makes room when full,
+    rows older than ``ttl`` seconds are never served.
+
+    Embeddings rate "amoxicillin 250mg" and "amoxicillin 500mg", or "with
+    alcohol" and "without alcohol", as near identical, so a match must also
+    mention the same numbers and the same negations.
+    """
+
+    def __init__(self, size, ttl, threshold):
+        self.size, self.ttl, self.threshold = size, ttl, threshold
+        self._vectors = None  # (size, dim) float32, allocated with the first row
+        self._answers = [None] * size
+        self._guards = [None] * size
+        self._stored = np.zeros(size)  # time.monotonic(), 0 for a free row
+        self._used = np.zeros(size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return int(np.count_nonzero(self._live(time.monotonic())))
+
+    def _live(self, now):
+        return (self._stored > 0) & (now - self._stored < self.ttl)
+
+    def match(self, vector, question):
+        with self._lock:
+            if self._vectors is None:
+                return None
+            now = time.monotonic()
+            scores = self._vectors @ vector
+            scores[~self._live(now)] = -1
+            row = int(np.argmax(scores))
+            if scores[row] < self.threshold or self._guards[row] != _guard(question):
+                return None
+            self._used[row] = now
+            return self._answers[row]
+
+    def add(self, vector, question, answer):
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.size, len(vector)), dtype=np.float32)
+            now = time.monotonic()
+            free = np.flatnonzero(~self._live(now))
+            row = int(free[0]) if len(free) else int(np.argmin(self._used))
+            self._vectors[row] = vector
+            self._answers[row] = answer
+            self._guards[row] = _guard(question)
+            self._stored[row] = self._used[row] = now
+
+    def clear(self):
+        with self._lock:
+            self._stored[:] = 0
+
+
+_semantic = SemanticCache(
+    settings.ANSWER_CACHE_SIZE, settings.ANSWER_CACHE_TTL, settings.ANSWER_CACHE_SIMILARITY,
+)
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def _embed(question):
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                from sentence_transformers import SentenceTransformer
+
+                _encoder = SentenceTransformer(settings.ANSWER_CACHE_EMBEDDING_MODEL, device="cpu")
+    return _encoder.encode(normalize(question), normalize_embeddings=True).astype(np.float32)
+
+
+async def _count(level):
+    key = METRIC_KEYS[level]
+    try:
+        try:
+            await cache.aincr(key)
+        except ValueError:  # first one, or evicted
+            await cache.aset(key, 1, None)
+    except Exception as e:
+        logger.warning("Answer cache metrics unavailable: %s", e)
+
+
+async def _embedding(question):
+    try:
+        # CPU bound, keep it off the event loop
+        return await sync_to_async(_embed, thread_sensitive=False)(question)
+    except Exception:
+        logger.exception("Could not embed the question, semantic cache skipped")
+        return None
+
+
+async def lookup(question):
+    """
+    A stored answer for ``question``, exact match first. Pass the returned
+    Lookup to store() after a miss so the question is not embedded twice.
+    A cache that fails counts as a miss.
+    """
+    try:
+        answer = await cache.aget(_exact_key(question))
+    except Exception as e:
+        logger.warning("Answer cache unavailable: %s", e)
+        return Lookup(None, "unavailable", None)
+    if answer is not None:
+        await _count("exact")
+        return Lookup(answer, "exact", None)
+
+    embedding = None
+    if settings.ANSWER_CACHE_SEMANTIC:
+        embedding = await _embedding(question)
+        answer = _semantic.match(embedding, question) if embedding is not None else None
+        if answer is not None:
+            await _count("semantic")
+            return Lookup(answer, "semantic", embedding)
+
+    await _count("miss")
+    return Lookup(None, None, embedding)
+
+
+async def store(question, answer, found=None):
+    """Remember ``answer`` in both levels. ``found`` is the Lookup that missed."""
+    if not answer.strip() or (found is not None and found.level == "unavailable"):
+        return
+    try:
+        await cache.aset(_exact_key(question), answer, settings.ANSWER_CACHE_TTL)
+    except Exception as e:
+        logger.warning("Answer cache unavailable, answer not stored: %s", e)
+        return
+    if settings.ANSWER_CACHE_SEMANTIC:
+        embedding = found.embedding if found is not None else None
+        if embedding is None:
+            embedding = await _embedding(question)
+        if embedding is not None:
+            _semantic.add(embedding, question, answer)
+
+
+def metrics():
+    """Hit counts across all workers, the hit rate and this process's semantic rows."""
+    counts = {level: cache.get(key, 0) for level, key in METRIC_KEYS.items()}
+    total = sum(counts.values())
+    hits = counts["exact"] + counts["semantic"]
+    return {
+        **counts,
+        "lookups": total,
+        "hit_rate": hits / total if total else None,
+        "semantic_rows": len(_semantic),
+    }
+
+
+def reset_metrics():
+    cache.delete_many(list(METRIC_KEYS.values()))
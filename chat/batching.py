@@ -0,0 +1,84 @@
+# chat/batching.py
+#
+# Generation on CPU is bound by matrix multiplies that cost about the same
+# for one row as for a few, so prompts that arrive together are generated
+# together. The ai worker runs its tasks in threads (--pool=threads), every
+# task hands its prompt to the one batching thread and waits for its reply.
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+
+from chat import ai_model
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingExecutor:
+    """
+    Collects prompts for up to ``max_wait`` seconds after the first one, or
+    until ``max_batch`` are waiting, and generates them in one call.
+    """
+
+    def __init__(self, max_batch, max_wait):
+        self.max_batch, self.max_wait = max_batch, max_wait
+        self._pending = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, messages, max_new_tokens=256):
+        """A Future for the reply to ``messages``."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ai-batching", daemon=True)
+                self._thread.start()
+        future = Future()
+        self._pending.put((messages, max_new_tokens, future))
+        return future
+
+    def _collect(self):
+        batch = [self._pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._generate(batch)
+            except Exception as e:  # every task waits on this thread, it must not die
+                logger.exception("Batch of %d prompts failed", len(batch))
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _generate(self, batch):
+        # tasks that gave up waiting cancelled their future, skip them
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        conversations = [messages for messages, _, _ in batch]
+        max_new_tokens = max(limit for _, limit, _ in batch)
+        started = time.perf_counter()
+        replies, counts = ai_model.generate_batch(conversations, max_new_tokens)
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Generated %d replies in %.1fs, %.1f tokens/s",
+            len(batch), elapsed, sum(counts) / elapsed if elapsed else 0,
+        )
+        for (_, _, future), reply in zip(batch, replies):
+            future.set_result(reply)
+
+executor = BatchingExecutor(settings.AI_BATCH_SIZE, settings.AI_BATCH_WAIT)
@@ -0,0 +1,243 @@
+# chat/llm.py
+#
+# The one way to the hosted model:
+#
+#   - a long lived client per process and event loop, so connections and TLS
+#     sessions are reused
+#   - at most LLM_MAX_CONCURRENCY calls in flight, callers queue for at most
+#     LLM_QUEUE_TIMEOUT seconds
+#   - a circuit breaker: after LLM_BREAKER_FAILURES failed or slow calls in a
+#     row, calls fail at once for LLM_BREAKER_COOLDOWN seconds instead of
+#     piling up behind an upstream that is down. A stream is slow when its
+#     first piece is, a long answer is not a sick upstream
+#   - every call is logged with its latency and token counts, metrics() sums
+#     them up for this process
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import Counter, deque
+
+from django.conf import settings
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, OpenAIError, Timeout
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    """The hosted model could not answer. The message is safe to show to the user."""
+
+
+BUSY = "The AI assistant is busy, please try again in a moment."
+UNAVAILABLE = "The AI assistant is not reachable right now, please try again."
+
+
+class CircuitBreaker:
+    """
+    Closed, calls go through and consecutive failures are counted. At
+    ``threshold`` it opens and refuses calls for ``cooldown`` seconds, then
+    lets a single trial call through: success closes it, failure opens it
+    again. A call slower than ``slow`` seconds counts as failed. Calls that
+    finish while it is open started before it opened and are ignored, only
+    the trial decides.
+    """
+
+    def __init__(self, threshold, cooldown, slow):
+        self.threshold, self.cooldown, self.slow = threshold, cooldown, slow
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._trial or time.monotonic() - self._opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def allow(self):
+        """(allowed, trial): pass ``trial`` on to record()."""
+        with self._lock:
+            if self._opened_at is None:
+                return True, False
+            if self._trial or time.monotonic() - self._opened_at < self.cooldown:
+                return False, False
+            self._trial = True
+            return True, True
+
+    def record(self, ok, elapsed, trial=False):
+        """``ok`` is None for a call that was abandoned (client went away)."""
+        with self._lock:
+            if trial:
+                self._trial = False
+            elif self._opened_at is not None:
+                return
+            if ok is None:
+                return
+            if ok and elapsed <= self.slow:
+                self._failures, self._opened_at = 0, None
+                return
+            self._failures += 1
+            if trial or self._failures >= self.threshold:
+                if self._opened_at is None or trial:
+                    logger.warning("LLM circuit open after %d failed or slow calls", self._failures)
+                self._opened_at = time.monotonic()
+
+
+_breaker = CircuitBreaker(
+    settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_COOLDOWN, settings.LLM_SLOW_CALL,
+)
+
+_counts = Counter()
+_latencies = deque(maxlen=1000)  # seconds, of the latest answered calls
+_metrics_lock = threading.Lock()
+
+
+def _record(outcome, elapsed=None, prompt_tokens=0, completion_tokens=0):
+    with _metrics_lock:
+        _counts[outcome] += 1
+        _counts["prompt_tokens"] += prompt_tokens
+        _counts["completion_tokens"] += completion_tokens
+        if elapsed is not None and outcome == "ok":
+            _latencies.append(elapsed)
+    if elapsed is not None:
+        logger.info(
+            "LLM call %s in %.2fs, %d prompt + %d completion tokens",
+            outcome, elapsed, prompt_tokens, completion_tokens,
+        )
+
+
+def metrics():
+    """Calls by outcome, tokens and latency percentiles of this process."""
+    with _metrics_lock:
+        latencies = sorted(_latencies)
+        counts = dict(_counts)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+
+    return {
+        **{outcome: counts.get(outcome, 0) for outcome in ("ok", "failed", "busy", "rejected")},
+        "prompt_tokens": counts.get("prompt_tokens", 0),
+        "completion_tokens": counts.get("completion_tokens", 0),
+        "latency_p50": percentile(0.5),
+        "latency_p95": percentile(0.95),
+        "breaker": _breaker.state,
+    }
+
+
+def _upstream_failure(e):
+    """Errors that say the upstream is unwell; a bad request does not."""
+    if isinstance(e, APIConnectionError):  # includes timeouts
+        return True
+    return isinstance(e, APIStatusError) and (e.status_code >= 500 or e.status_code == 429)
+
+
+def _usage(completion):
+    usage = getattr(completion, "usage", None)
+    return (usage.prompt_tokens, usage.completion_tokens) if usage else (0, 0)
+
+
+# One client (and its connection pool) and one concurrency limit per event
+# loop. Under uvicorn that is one per worker process; an httpx pool cannot be
+# shared between loops, which is what async_to_sync gives a WSGI server.
+_per_loop = weakref.WeakKeyDictionary()
+
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _per_loop.get(loop)
+    if state is None:
+        client = AsyncOpenAI(
+            base_url=settings.LLM_BASE_URL,
+            api_key=settings.HF_API_KEY,
+            timeout=Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+            max_retries=settings.LLM_MAX_RETRIES,
+        )
+        state = _per_loop[loop] = (client, asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY))
+    return state
+
+
+async def _acquire(slots):
+    """Take a slot and pass the breaker; returns whether this is its trial call."""
+    try:
+        await asyncio.wait_for(slots.acquire(), settings.LLM_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _record("busy")
+        raise LLMError(BUSY)
+    allowed, trial = _breaker.allow()
+    if not allowed:
+        slots.release()
+        _record("rejected")
+        raise LLMError(UNAVAILABLE)
+    return trial
+
+
+def _unavailable(e):
+    logger.warning("LLM request failed: %s", e)
+    return LLMError(UNAVAILABLE)
+
+
+async def complete(messages, model=None):
+    """
+    Chat completion for ``messages`` (OpenAI format) from the hosted model.
+    Waits at most LLM_QUEUE_TIMEOUT seconds for a free slot, raises LLMError
+    when busy, timed out or failing.
+    """
+    client, slots = _state()
+    trial = await _acquire(slots)
+    started, ok = time.monotonic(), None
+    try:
+        completion = await client.chat.completions.create(
+            model=model or settings.LLM_MODEL,
+            messages=messages,
+        )
+        ok = True
+    except OpenAIError as e:
+        ok = not _upstream_failure(e)
+        _record("failed", time.monotonic() - started)
+        raise _unavailable(e) from e
+    finally:
+        slots.release()
+        _breaker.record(ok, time.monotonic() - started, trial)
+
+    _record("ok", time.monotonic() - started, *_usage(completion))
+    return completion.choices[0].message.content or ""
+
+
+async def stream(messages, model=None):
+    """
+    Like complete(), but yields the reply in pieces as the model produces
+    them. The slot is held until the stream is exhausted or closed.
+    """
+    client, slots = _state()
+    trial = await _acquire(slots)
+    started, ok, pieces = time.monotonic(), None, 0
+    first_piece = None
+    try:
+        chunks = await client.chat.completions.create(
+            model=model or settings.LLM_MODEL,
+            messages=messages,
+            stream=True,
+        )
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces += 1
+                first_piece = first_piece or time.monotonic()
+                yield chunk.choices[0].delta.content
+        ok = True
+    except OpenAIError as e:
+        ok = not _upstream_failure(e)
+        _record("failed", time.monotonic() - started)
+        raise _unavailable(e) from e
+    finally:
+        slots.release()
+        # the breaker judges the upstream by how soon it starts answering
+        _breaker.record(ok, (first_piece or time.monotonic()) - started, trial)
+
+    # streamed replies carry no usage, one piece is about one token
+    _record("ok", time.monotonic() - started, completion_tokens=pieces)
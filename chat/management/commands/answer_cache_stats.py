@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from chat import answer_cache
+
+
+class Command(BaseCommand):
+    help = "Show how often AI questions were answered from the answer cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after printing them")
+
+    def handle(self, *args, **opts):
+        stats = answer_cache.metrics()
+        if not stats["lookups"]:
+            self.stdout.write("No questions looked up yet.")
+        else:
+            self.stdout.write(
+                f"{stats['lookups']} lookups: {stats['exact']} exact hits, "
+                f"{stats['semantic']} semantic hits, {stats['miss']} misses"
+            )
+            self.stdout.write(self.style.SUCCESS(f"Hit rate {stats['hit_rate']:.1%}"))
+
+        if opts["reset"]:
+            answer_cache.reset_metrics()
+            self.stdout.write("Counters reset.")
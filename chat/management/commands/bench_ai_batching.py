@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from chat import ai_model
+
+QUESTIONS = [
+    "What class of drug is amoxicillin?",
+    "Is cetirizine safe for children?",
+    "What is paracetamol used for?",
+    "Can ibuprofen be taken with food?",
+    "What is the usual adult dose of metformin?",
+    "Which drug class does losartan belong to?",
+    "What are common side effects of omeprazole?",
+    "Is salbutamol a steroid?",
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmark local model throughput (generated tokens/s) at several batch sizes on CPU."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1,4,8", help="Comma separated batch sizes")
+        parser.add_argument("--prompts", type=int, default=8, help="Prompts generated per batch size")
+        parser.add_argument("--max-new-tokens", type=int, default=64)
+
+    def handle(self, *args, **opts):
+        sizes = [int(size) for size in opts["sizes"].split(",")]
+        prompts = [
+            [{"role": "user", "content": QUESTIONS[i % len(QUESTIONS)]}]
+            for i in range(opts["prompts"])
+        ]
+
+        self.stdout.write(self.style.WARNING("Loading the model..."))
+        ai_model.get_model()
+        ai_model.generate_batch(prompts[:1], max_new_tokens=4)  # first call pays one-off setup
+
+        results = []
+        for size in sizes:
+            tokens = 0
+            start = time.perf_counter()
+            for i in range(0, len(prompts), size):
+                # greedy, so runs are repeatable
+                _, counts = ai_model.generate_batch(
+                    prompts[i:i + size], max_new_tokens=opts["max_new_tokens"], do_sample=False,
+                )
+                tokens += sum(counts)
+            elapsed = time.perf_counter() - start
+            results.append((size, tokens, elapsed))
+            self.stdout.write(
+                f"batch {size:>2}: {tokens} tokens in {elapsed:.1f}s = {tokens / elapsed:.1f} tokens/s"
+            )
+
+        base = results[0][1] / results[0][2]
+        self.stdout.write(self.style.SUCCESS(f"Speedup over batch size {results[0][0]}: " + ", ".join(
+            f"{size}: {tokens / elapsed / base:.2f}x" for size, tokens, elapsed in results
+        )))
@@ -1,9 +1,16 @@
 from celery import shared_task
-from .ai_model import generate_reply
+from django.conf import settings
+
+from .batching import executor
 
 @shared_task(queue='ai')
 def generate_ai_reply(messages):
+    future = executor.submit(messages)
     try:
-        return generate_reply(messages)
+        # the threads pool ignores Celery's time limits, a hung batch must not hold this thread
+        return future.result(timeout=settings.AI_REPLY_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        return "⚠️ Error generating reply: the AI model took too long, please try again."
     except Exception as e:
-        return f"⚠️ Error generating reply: {str(e)}"
\ No newline at end of file
+        return f"⚠️ Error generating reply: {str(e)}"
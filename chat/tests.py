@@ -1,3 +1,245 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+
+from chat import ai_model, answer_cache, llm, tasks
+from chat.answer_cache import SemanticCache
+from chat.batching import BatchingExecutor
+from chat.llm import CircuitBreaker
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class SemanticCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = SemanticCache(size=2, ttl=60, threshold=0.9)
+        self.vector = unit([1, 0, 0])
+        self.cache.add(self.vector, "Is cetirizine safe in pregnancy?", "yes")
+
+    def test_similar_question_is_served(self):
+        self.assertEqual(self.cache.match(unit([1, 0.1, 0]), "cetirizine safe during pregnancy"), "yes")
+
+    def test_negated_question_is_not_served(self):
+        self.assertIsNone(self.cache.match(self.vector, "Is cetirizine not safe in pregnancy?"))
+        self.assertIsNone(self.cache.match(self.vector, "Isn't cetirizine safe in pregnancy?"))
+        self.assertIsNone(self.cache.match(self.vector, "Is cetirizine unsafe in pregnancy?"))
+
+    def test_different_numbers_are_not_served(self):
+        self.cache.add(unit([0, 1, 0]), "amoxicillin 500mg for kids", "ok")
+        self.assertIsNone(self.cache.match(unit([0, 1, 0]), "amoxicillin 250mg for kids"))
+
+    def test_least_recently_used_row_makes_room(self):
+        self.cache.add(unit([0, 1, 0]), "second", "2")
+        self.cache.match(self.vector, "Is cetirizine safe in pregnancy?")  # touch the first
+        self.cache.add(unit([0, 0, 1]), "third", "3")
+
+        self.assertEqual(self.cache.match(self.vector, "Is cetirizine safe in pregnancy?"), "yes")
+        self.assertIsNone(self.cache.match(unit([0, 1, 0]), "second"))
+
+
+class FailingCache:
+    async def aget(self, *args, **kwargs):
+        raise ConnectionError("redis down")
+
+    aset = aincr = aget
+
+
+@override_settings(ANSWER_CACHE_SEMANTIC=False)
+class AnswerCacheOutageTests(SimpleTestCase):
+    def test_unavailable_cache_is_a_miss(self):
+        with mock.patch.object(answer_cache, "cache", FailingCache()):
+            found = async_to_sync(answer_cache.lookup)("what class is amoxicillin")
+            async_to_sync(answer_cache.store)("what class is amoxicillin", "a penicillin", found)
+
+        self.assertIsNone(found.answer)
+
+
+class StubLLM(BaseHTTPRequestHandler):
+    """
+    OpenAI compatible chat completions, behaving by the question:
+    "bad" 400, "boom" 500, "hang" answers after 2s, "drag" after 0.3s,
+    "trickle" streams its first piece at once and the rest slowly.
+    """
+    hits = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        type(self).hits += 1
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        question = body["messages"][-1]["content"]
+        if question in ("bad", "boom"):
+            return self.reply(400 if question == "bad" else 500, {"error": {"message": question}})
+        time.sleep({"hang": 2, "drag": 0.3}.get(question, 0))
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for word in ["You", " asked", " ", question]:
+                chunk = {
+                    "id": "1", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                if question == "trickle":
+                    time.sleep(0.15)
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        self.reply(200, {
+            "id": "1", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": f"You asked {question}"},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 3, "total_tokens": 6},
+        })
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except BrokenPipeError:  # the client timed out
+            pass
+
+
+class GatewayTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLM)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings = override_settings(
+            LLM_BASE_URL=f"http://127.0.0.1:{cls.server.server_port}/v1",
+            LLM_TIMEOUT=1.0,
+            LLM_MAX_RETRIES=0,
+        )
+        cls.settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=2, cooldown=0.3, slow=0.2)
+        patcher = mock.patch.object(llm, "_breaker", self.breaker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ask(self, question):
+        return async_to_sync(llm.complete)([{"role": "user", "content": question}])
+
+    def ask_streamed(self, question):
+        async def collect():
+            return "".join([piece async for piece in llm.stream([{"role": "user", "content": question}])])
+        return async_to_sync(collect)()
+
+    def fail(self, question, times=1):
+        for _ in range(times):
+            with self.assertRaises(llm.LLMError):
+                self.ask(question)
+
+    def test_answer(self):
+        self.assertEqual(self.ask("ok"), "You asked ok")
+        self.assertEqual(self.ask_streamed("ok"), "You asked ok")
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_bad_request_does_not_open_the_circuit(self):
+        self.fail("bad", times=3)
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_server_errors_open_the_circuit(self):
+        self.fail("boom", times=2)
+        self.assertEqual(self.breaker.state, "open")
+
+        hits = StubLLM.hits
+        self.fail("ok")  # refused without asking the upstream
+        self.assertEqual(StubLLM.hits, hits)
+
+    def test_timeouts_open_the_circuit(self):
+        self.fail("hang", times=2)
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_slow_answers_open_the_circuit(self):
+        self.ask("drag")
+        self.ask("drag")
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_long_stream_that_starts_quickly_is_healthy(self):
+        self.assertEqual(self.ask_streamed("trickle"), "You asked trickle")
+        self.assertEqual(self.ask_streamed("trickle"), "You asked trickle")
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_successful_trial_closes_the_circuit(self):
+        self.fail("boom", times=2)
+        time.sleep(0.35)
+        self.assertEqual(self.breaker.state, "half-open")
+
+        self.assertEqual(self.ask("ok"), "You asked ok")
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_failed_trial_opens_the_circuit_again(self):
+        self.fail("boom", times=2)
+        time.sleep(0.35)
+
+        self.fail("boom")
+        self.assertEqual(self.breaker.state, "open")
+        self.fail("ok")
+
+    def test_only_the_trial_call_ends_the_trial(self):
+        self.fail("boom", times=2)
+        time.sleep(0.35)
+        allowed, trial = self.breaker.allow()
+        self.assertTrue(allowed and trial)
+
+        self.breaker.record(True, 0.01)  # a call from before the circuit opened
+        self.assertEqual(self.breaker.allow(), (False, False))
+
+        self.breaker.record(True, 0.01, trial=True)
+        self.assertEqual(self.breaker.state, "closed")
+
+
+class BatchingExecutorTests(SimpleTestCase):
+    def setUp(self):
+        self.executor = BatchingExecutor(max_batch=4, max_wait=0.01)
+
+    def test_failed_batch_does_not_stop_the_thread(self):
+        with mock.patch.object(ai_model, "generate_batch", side_effect=RuntimeError("out of memory")):
+            with self.assertRaises(RuntimeError):
+                self.executor.submit([{"role": "user", "content": "hi"}]).result(timeout=1)
+
+        with mock.patch.object(ai_model, "generate_batch", return_value=(["hello"], None)):
+            # counts is not a list, the logging fails after generating
+            with self.assertRaises(TypeError):
+                self.executor.submit([{"role": "user", "content": "hi"}]).result(timeout=1)
+
+        with mock.patch.object(ai_model, "generate_batch", return_value=(["hello"], [1])):
+            self.assertEqual(self.executor.submit([{"role": "user", "content": "hi"}]).result(timeout=1), "hello")
+
+    @override_settings(AI_REPLY_TIMEOUT=0.01)
+    def test_task_gives_up_on_a_hung_batch(self):
+        future = Future()
+        with mock.patch.object(tasks.executor, "submit", return_value=future):
+            reply = tasks.generate_ai_reply([{"role": "user", "content": "hi"}])
+
+        self.assertIn("took too long", reply)
+        self.assertTrue(future.cancelled())
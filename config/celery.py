@@ -1,9 +1,25 @@
 import os
 from celery import Celery
+from celery.signals import celeryd_init
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 app = Celery('config')
 
 app.config_from_object('django.conf:settings', namespace='CELERY')
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+
+@celeryd_init.connect
+def preload_ai_model(options=None, **kwargs):
+    """
+    Runs in the worker's main process, before the pool starts. A worker that
+    consumes the ai queue (chat.tasks) loads the model here, so its pool
+    threads find it loaded.
+    """
+    queues = (options or {}).get('queues') or []
+    if isinstance(queues, str):
+        queues = queues.split(',')
+    if 'ai' in queues:
+        from chat import ai_model
+        ai_model.warm_up()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+from celery.schedules import crontab
 from django.contrib.messages import constants as messages
 import environ
 
@@ -54,6 +55,9 @@ INSTALLED_APPS = [
 
     #3rd party
     'django_htmx',
+    'channels',
+    'rest_framework',
+    'rest_framework.authtoken',
 ]
 
 
@@ -81,12 +85,24 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'inventory.context_processors.notifications',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Channels (live updates over websockets)
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': [env('CHANNELS_REDIS_URL', default='redis://127.0.0.1:6379/1')],
+        },
+    },
+}
 
 
 # Database
@@ -104,6 +120,15 @@ DATABASES = {
 }
 
 
+# Cache (shared between workers, used for the dashboard stats snapshot)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('REDIS_CACHE_URL', default='redis://127.0.0.1:6379/2'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -160,6 +185,16 @@ if not DEBUG:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.TokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+}
+
 LOGIN_REDIRECT_URL = 'dashboard'  # after login, go to medicines list
 LOGOUT_REDIRECT_URL = 'login'
 if not DEBUG:
@@ -174,3 +209,48 @@ if not DEBUG:
 # Hugging Face API Key
 HF_API_KEY = env('HF_API_KEY')
 
+# Hosted LLM behind the Hugging Face router (OpenAI compatible), see chat/llm.py
+LLM_BASE_URL = env('LLM_BASE_URL', default='https://router.huggingface.co/v1')
+LLM_MODEL = env('LLM_MODEL', default='meta-llama/Llama-3.1-8B-Instruct:cerebras')
+LLM_TIMEOUT = env.float('LLM_TIMEOUT', default=60.0)  # seconds for the whole completion
+LLM_CONNECT_TIMEOUT = env.float('LLM_CONNECT_TIMEOUT', default=5.0)
+LLM_MAX_RETRIES = env.int('LLM_MAX_RETRIES', default=1)
+LLM_MAX_CONCURRENCY = env.int('LLM_MAX_CONCURRENCY', default=4)  # in-flight requests per worker
+LLM_QUEUE_TIMEOUT = env.float('LLM_QUEUE_TIMEOUT', default=10.0)  # wait for a free slot before giving up
+LLM_BREAKER_FAILURES = env.int('LLM_BREAKER_FAILURES', default=5)  # failed or slow calls in a row that open the circuit
+LLM_BREAKER_COOLDOWN = env.float('LLM_BREAKER_COOLDOWN', default=30.0)  # seconds calls fail at once before a retry
+LLM_SLOW_CALL = env.float('LLM_SLOW_CALL', default=20.0)  # seconds to the answer (its first piece when streamed) that still count as failed
+
+# Local model on the ai Celery queue, see chat/batching.py
+AI_BATCH_SIZE = env.int('AI_BATCH_SIZE', default=8)  # replies generated together at most
+AI_BATCH_WAIT = env.float('AI_BATCH_WAIT', default=0.01)  # seconds to wait for more prompts to batch with
+AI_REPLY_TIMEOUT = env.float('AI_REPLY_TIMEOUT', default=300.0)  # seconds a task waits for its reply before giving up
+
+# Answers to repeated questions, see chat/answer_cache.py
+ANSWER_CACHE_TTL = env.int('ANSWER_CACHE_TTL', default=60 * 60 * 24)  # seconds
+ANSWER_CACHE_SEMANTIC = env.bool('ANSWER_CACHE_SEMANTIC', default=False)  # opt in, see NEGATIONS in chat/answer_cache.py
+ANSWER_CACHE_SIZE = env.int('ANSWER_CACHE_SIZE', default=2048)  # embedded questions per worker
+ANSWER_CACHE_SIMILARITY = env.float('ANSWER_CACHE_SIMILARITY', default=0.93)  # cosine similarity to count as the same question
+ANSWER_CACHE_EMBEDDING_MODEL = env('ANSWER_CACHE_EMBEDDING_MODEL', default='sentence-transformers/all-MiniLM-L6-v2')
+
+
+# Celery
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://127.0.0.1:6379/0')
+CELERY_BEAT_SCHEDULE = {
+    'refresh-notifications': {
+        'task': 'inventory.tasks.refresh_notifications',
+        'schedule': 60.0,  # seconds
+    },
+    'rollover-stock-summaries': {
+        'task': 'inventory.tasks.rollover_stock_summaries',
+        'schedule': crontab(hour=0, minute=1),  # UTC, expiry is checked against timezone.now().date()
+    },
+    'snapshot-stock': {
+        'task': 'inventory.tasks.snapshot_stock',
+        'schedule': crontab(minute=30),  # hourly
+    },
+    'expire-reservations': {
+        'task': 'inventory.tasks.expire_reservations',
+        'schedule': 60.0,
+    },
+}
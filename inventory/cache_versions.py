@@ -0,0 +1,30 @@
+# inventory/cache_versions.py
+#
+# Version counters for cached data. Readers put current_version() in their
+# cache keys, writers bump_version() so every cached copy is unreachable at
+# once.
+
+import time
+
+from django.core.cache import cache
+
+
+def _fresh():
+    # A counter that was evicted restarts from the clock, never from a number
+    # entries cached before the eviction may still be stored under.
+    return time.time_ns()
+
+
+def current_version(key):
+    """Raises what the cache raises; callers fall back to the database."""
+    return cache.get_or_set(key, _fresh, None)
+
+
+def bump_version(key):
+    """Move ``key`` to a version nothing was cached under, and return it."""
+    try:
+        return cache.incr(key)
+    except ValueError:  # evicted or never set
+        version = _fresh()
+        cache.set(key, version, None)
+        return version
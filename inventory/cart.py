@@ -0,0 +1,89 @@
+# inventory/cart.py
+
+import uuid
+
+from django.db import transaction
+
+from inventory.models import CartLine, MedicineStockSummary, StockReservation, Transaction, TransactionBatch
+
+
+class Cart:
+    """
+    The order cart of one user, one CartLine row per line. Adding or
+    removing a line touches only that row (and its stock reservation);
+    listing hydrates the whole cart in two queries.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def _lines(self):
+        return CartLine.objects.filter(user=self.user)
+
+    def add(self, medicine_id, quantity):
+        """Reserve the stock and add a line. Raises ValueError when it cannot be promised."""
+        line_id = uuid.uuid4()
+        with transaction.atomic():
+            StockReservation.reserve(self.user, medicine_id, quantity, line_id)
+            return CartLine.objects.create(
+                id=line_id,
+                user=self.user,
+                medicine_id=medicine_id,
+                quantity_dispensed=quantity,
+            )
+
+    def remove(self, line_id):
+        try:
+            line_id = uuid.UUID(str(line_id))
+        except ValueError:
+            return 0
+        with transaction.atomic():
+            removed = self._lines().filter(id=line_id).delete()[0]
+            if removed:  # only this user's own line frees its stock
+                StockReservation.release([line_id])
+            return removed
+
+    def clear(self):
+        with transaction.atomic():
+            line_ids = list(self._lines().values_list("id", flat=True))
+            StockReservation.release(line_ids)
+            return self._lines().filter(id__in=line_ids).delete()[0]
+
+    def count(self):
+        return self._lines().count()
+
+    def list(self):
+        """Lines with their medicine and current ``in_stock``; also keeps the reservations alive."""
+        lines = list(self._lines().select_related("medicine").order_by("created_at"))
+        stock = dict(
+            MedicineStockSummary.objects.filter(pk__in={line.medicine_id for line in lines})
+            .values_list("medicine_id", "sellable")
+        )
+        for line in lines:
+            line.in_stock = stock.get(line.medicine_id, 0)
+        StockReservation.touch([line.id for line in lines])
+        return lines
+
+    def checkout(self):
+        """Dispense every line as one TransactionBatch and empty the cart."""
+        with transaction.atomic():
+            lines = list(self._lines().order_by("created_at"))
+            if not lines:
+                raise ValueError("Empty orders")
+
+            tb = TransactionBatch.objects.create(
+                user=self.user,
+                batch_id=TransactionBatch.generate_batch_id()
+            )
+            tb.dispense([
+                Transaction(
+                    user=self.user,
+                    medicine_id=line.medicine_id,
+                    quantity_dispensed=line.quantity_dispensed,
+                )
+                for line in lines
+            ])
+            line_ids = [line.id for line in lines]
+            StockReservation.release(line_ids)
+            self._lines().filter(id__in=line_ids).delete()
+        return tb
@@ -0,0 +1,24 @@
+# inventory/consumers.py
+
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from inventory.events import GLOBAL_GROUP
+
+
+class LiveUpdatesConsumer(AsyncJsonWebsocketConsumer):
+    """Pushes "something changed" events so pages refetch only when needed."""
+
+    async def connect(self):
+        user = self.scope["user"]
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(GLOBAL_GROUP, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(GLOBAL_GROUP, self.channel_name)
+
+    async def live_update(self, event):
+        await self.send_json({"topics": event["topics"]})
@@ -0,0 +1,25 @@
+# inventory/context_processors.py
+
+from django.utils.functional import SimpleLazyObject
+
+from inventory.notifications import notification_feed
+
+
+def notifications(request):
+    """
+    Notification bell data for base.html. Nothing is fetched unless a
+    template actually uses it, and at most once per request.
+    """
+    if not request.user.is_authenticated:
+        return {}
+
+    def feed():
+        if not hasattr(request, "_notification_feed"):
+            request._notification_feed = notification_feed()
+        return request._notification_feed
+
+    return {
+        "notifications": SimpleLazyObject(lambda: feed()["latest"]),
+        "notification_count": SimpleLazyObject(lambda: feed()["notification_count"]),
+        "unread_notifications": SimpleLazyObject(lambda: feed()["unread_notifications"]),
+    }
@@ -0,0 +1,51 @@
+# inventory/events.py
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_GROUP = "live"
+
+# Topics the browser listens to (dispatched as "live:<topic>" htmx events)
+INVENTORY = "inventory"
+TRANSACTIONS = "transactions"
+NOTIFICATIONS = "notifications"
+
+
+_listeners = []
+
+
+def subscribe(listener):
+    """Also call ``listener(topics)`` in this process on every publish (e.g. cache invalidation)."""
+    _listeners.append(listener)
+
+
+def publish(*topics):
+    """
+    Tell every connected browser that ``topics`` changed.
+
+    The event is sent once the current DB transaction commits, so clients
+    never refetch data that is not visible yet.
+    """
+    def send():
+        # runs after the commit: whatever fails here, the write has happened
+        for listener in _listeners:
+            try:
+                listener(topics)
+            except Exception:
+                logger.exception("Listener %r failed for %s", listener, topics)
+
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        try:
+            async_to_sync(layer.group_send)(GLOBAL_GROUP, {"type": "live.update", "topics": list(topics)})
+        except Exception:
+            # live updates are best effort, never fail the write because of them
+            logger.exception("Could not publish %s", topics)
+
+    transaction.on_commit(send)
@@ -1,7 +1,6 @@
 from django import forms
 
-from .models import Transaction, Medicine
-from django.db.models import Sum
+from .models import Transaction, Medicine, MedicineStockSummary, DosageInstruction, StockReservation
 from django.forms import modelformset_factory
 
 class MedicineClassificationForm(forms.Form):
@@ -35,7 +34,21 @@ class TransactionForm(forms.ModelForm):
             }),
            
         }
-    
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Options are loaded remotely by tom-select. Render only the current
+        # choice, submitted or initial, so a form shown again after an error
+        # keeps it; validation still looks up just the submitted id.
+        field = self.fields["medicine"]
+        ids = set()
+        for value in (self["medicine"].value(), self.get_initial_for_field(field, "medicine")):
+            try:
+                ids.add(int(getattr(value, "pk", value)))
+            except (TypeError, ValueError):
+                pass
+        selected = Medicine.objects.filter(pk__in=ids) if ids else Medicine.objects.none()
+        field.widget.choices = [("", field.empty_label)] + [(m.pk, str(m)) for m in selected]
 
     def clean(self):
         cleaned_data = super().clean()
@@ -45,13 +58,117 @@ class TransactionForm(forms.ModelForm):
         
 
         if medicine and qty:
-            total_stock = medicine.inventory.aggregate(total=Sum("quantity"))["total"] or 0
+            total_stock = MedicineStockSummary.sellable_for(medicine.pk)
             if qty > total_stock:
                 self.add_error("quantity_dispensed", f"Not enough stock. Available: {total_stock}")
 
         return cleaned_data
     
 
+class TransactionRowsForm:
+    """
+    Validates the ``form-N-*`` rows posted by the multi-line transaction
+    page in bulk. Medicines and dosages are loaded with one ``in_bulk``
+    each and stock for every requested medicine in one go, so the number
+    of queries does not grow with the number of rows. Quantities of the
+    same medicine are added up across rows before checking stock.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.errors = []
+        self.rows = []  # (medicine, dosage, quantity, remarks)
+
+    def posted_rows(self):
+        """
+        Every row as submitted, for showing the page again after an error.
+        The selected medicines come with their labels, the selects have no
+        other options to show them by.
+        """
+        total_forms = int(self.data.get("form-TOTAL_FORMS", 0) or 0)
+        rows = [
+            {
+                "medicine_id": self.data.get(f"form-{i}-medicine") or "",
+                "quantity": self.data.get(f"form-{i}-quantity_dispensed") or "",
+                "dosage_id": self.data.get(f"form-{i}-dosage") or "",
+                "remarks": self.data.get(f"form-{i}-remarks") or "",
+            }
+            for i in range(total_forms)
+        ]
+        ids = {int(row["medicine_id"]) for row in rows if row["medicine_id"].isdigit()}
+        labels = {pk: str(medicine) for pk, medicine in Medicine.objects.in_bulk(ids).items()}
+        for row in rows:
+            label = labels.get(int(row["medicine_id"])) if row["medicine_id"].isdigit() else None
+            if label is None:
+                row["medicine_id"] = ""
+            row["medicine_text"] = label or ""
+        return rows
+
+    def parse_rows(self):
+        total_forms = int(self.data.get("form-TOTAL_FORMS", 0) or 0)
+        rows = []
+        for i in range(total_forms):
+            row = {
+                "number": i + 1,
+                "medicine": self.data.get(f"form-{i}-medicine"),
+                "quantity": self.data.get(f"form-{i}-quantity_dispensed"),
+                "dosage": self.data.get(f"form-{i}-dosage"),
+                "remarks": self.data.get(f"form-{i}-remarks") or "",
+            }
+            if not row["medicine"] or not row["quantity"] or not row["dosage"]:
+                self.errors.append(f"Row {row['number']}: Medicine and quantity and dosage are required")
+                continue
+            try:
+                row["medicine"] = int(row["medicine"])
+                row["dosage"] = int(row["dosage"])
+                row["quantity"] = int(row["quantity"])
+            except ValueError:
+                self.errors.append(f"Row {row['number']}: Invalid medicine, dosage or quantity")
+                continue
+            if row["quantity"] <= 0:
+                self.errors.append(f"Row {row['number']}: Quantity must be at least 1")
+                continue
+            rows.append(row)
+        return rows
+
+    def is_valid(self):
+        rows = self.parse_rows()
+        medicines = Medicine.objects.in_bulk({row["medicine"] for row in rows})
+        dosages = DosageInstruction.objects.in_bulk({row["dosage"] for row in rows})
+
+        requested = {}
+        for row in rows:
+            if row["medicine"] in medicines:
+                requested[row["medicine"]] = requested.get(row["medicine"], 0) + row["quantity"]
+        available = StockReservation.available_for_many(list(requested))
+
+        for row in rows:
+            med = medicines.get(row["medicine"])
+            dos = dosages.get(row["dosage"])
+            if med is None:
+                self.errors.append(f"Row {row['number']}: Medicine with ID {row['medicine']} does not exist")
+                continue
+            if dos is None:
+                self.errors.append(f"Row {row['number']}: Dosage with ID {row['dosage']} does not exist")
+                continue
+            if requested[med.pk] > available[med.pk]:
+                self.errors.append(
+                    f"Row {row['number']}: Not enough stock for {med.generic_name}. "
+                    f"Available: {max(available[med.pk], 0)}, requested: {requested[med.pk]}"
+                )
+                continue
+            self.rows.append((med, dos, row["quantity"], row["remarks"]))
+
+        return not self.errors
+
+    def transactions(self, user):
+        """Unsaved transactions for the validated rows, ready for TransactionBatch.dispense."""
+        return [
+            Transaction(user=user, medicine=med, dosage=dos, quantity_dispensed=qty, remarks=remarks)
+            for med, dos, qty, remarks in self.rows
+        ]
+
+
 TransactionFormSet = modelformset_factory(
     Transaction,
     form=TransactionForm,
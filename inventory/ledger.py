@@ -0,0 +1,69 @@
+# inventory/ledger.py
+
+from datetime import timedelta
+
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from inventory.models import Inventory, StockMovement, StockSnapshot, Transaction
+
+# Movements are stamped before their transaction commits; leave them time to
+# land so a snapshot never skips a row that becomes visible afterwards.
+SNAPSHOT_SETTLE = timedelta(minutes=5)
+
+
+def take_snapshots():
+    """
+    Snapshot every batch that moved since the previous run. The quantity is
+    derived from the ledger itself (previous snapshot + deltas), so it is
+    consistent with the movements it covers.
+    """
+    taken_at = timezone.now() - SNAPSHOT_SETTLE
+    since = StockSnapshot.objects.aggregate(last=Max("taken_at"))["last"]
+
+    moved = StockMovement.objects.filter(created_at__lte=taken_at)
+    if since is not None:
+        moved = moved.filter(created_at__gt=since)
+    deltas = dict(moved.values_list("inventory_id").annotate(total=Sum("delta")).order_by())
+    if not deltas:
+        return 0
+
+    previous = dict(
+        Inventory.objects.all_items()
+        .filter(id__in=deltas)
+        .annotate(last=Subquery(
+            StockSnapshot.objects.filter(inventory=OuterRef("pk"))
+            .order_by("-taken_at")
+            .values("quantity")[:1]
+        ))
+        .values_list("id", "last")
+    )
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(inventory_id=inv_id, quantity=(previous.get(inv_id) or 0) + delta, taken_at=taken_at)
+        for inv_id, delta in deltas.items()
+    ], batch_size=1000)
+    return len(deltas)
+
+
+def stock_at(inventory_id, when):
+    """Quantity of a batch at ``when``: latest snapshot before it plus the deltas since."""
+    snapshot = (
+        StockSnapshot.objects.filter(inventory_id=inventory_id, taken_at__lte=when)
+        .order_by("-taken_at")
+        .first()
+    )
+    moves = StockMovement.objects.filter(inventory_id=inventory_id, created_at__lte=when)
+    if snapshot is not None:
+        moves = moves.filter(created_at__gt=snapshot.taken_at)
+    base = snapshot.quantity if snapshot is not None else 0
+    return base + (moves.aggregate(total=Sum("delta"))["total"] or 0)
+
+
+def recall(batch_number):
+    """Every transaction that consumed stock from a lot, newest first."""
+    return (
+        Transaction.objects.filter(movements__inventory__batch_number=batch_number)
+        .select_related("medicine", "user", "batch")
+        .distinct()
+        .order_by("-transaction_date")
+    )
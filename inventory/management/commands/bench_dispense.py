@@ -0,0 +1,89 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from inventory.models import Medicine, Inventory, Transaction
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent Transaction.dispense() calls against one hot medicine."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent dispensers")
+        parser.add_argument("--dispenses", type=int, default=200, help="Dispenses per worker")
+        parser.add_argument("--qty", type=int, default=1, help="Units per dispense")
+        parser.add_argument("--batches", type=int, default=20, help="Inventory batches for the hot medicine")
+
+    def handle(self, *args, **opts):
+        workers, per_worker, qty = opts["workers"], opts["dispenses"], opts["qty"]
+        # stock for ~90% of the demand so the run also exercises the out-of-stock path
+        total_stock = int(workers * per_worker * qty * 0.9)
+        batch_qty = max(1, total_stock // opts["batches"])
+
+        medicine = Medicine.objects.create(
+            generic_name=f"BENCH-{uuid.uuid4().hex[:8]}",
+            dosage_form="Tablet",
+            strength="1mg",
+        )
+        today = timezone.now().date()
+        Inventory.objects.bulk_create([
+            Inventory(
+                medicine=medicine,
+                batch_number=f"BENCH{i}",
+                quantity=batch_qty,
+                expiration_date=today + timedelta(days=30 + i),
+            )
+            for i in range(opts["batches"])
+        ])
+        stock = batch_qty * opts["batches"]
+
+        results = {"ok": 0, "out_of_stock": 0, "errors": 0}
+        lock = threading.Lock()
+
+        def run():
+            ok = out = err = 0
+            try:
+                for _ in range(per_worker):
+                    tx = Transaction(medicine=medicine, quantity_dispensed=qty, status="dispensed")
+                    try:
+                        tx.dispense()
+                        ok += 1
+                    except ValueError:
+                        out += 1
+                    except Exception as e:  # deadlocks, lock wait timeouts...
+                        err += 1
+                        self.stderr.write(str(e))
+            finally:
+                connection.close()
+            with lock:
+                results["ok"] += ok
+                results["out_of_stock"] += out
+                results["errors"] += err
+
+        self.stdout.write(self.style.WARNING(
+            f"Dispensing {workers}x{per_worker} x {qty} unit(s) from {stock} units in {opts['batches']} batches..."
+        ))
+        threads = [threading.Thread(target=run) for _ in range(workers)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        remaining = sum(Inventory.objects.all_items().filter(medicine=medicine).values_list("quantity", flat=True))
+        expected = stock - results["ok"] * qty
+        medicine.delete()
+
+        self.stdout.write(
+            f"{results['ok']} dispensed, {results['out_of_stock']} out of stock, {results['errors']} errors "
+            f"in {elapsed:.2f}s ({results['ok'] / elapsed:.1f} dispenses/s)"
+        )
+        if remaining != expected:
+            self.stdout.write(self.style.ERROR(f"❌ Stock mismatch: {remaining} left, expected {expected}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ No oversell: {remaining} units left as expected"))
@@ -0,0 +1,164 @@
+import random
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from inventory import stats
+from inventory.models import Inventory, Medicine, Notification, StockMovement, Transaction
+from inventory.search import parse_transaction_query
+
+
+# Django compiles boolean filters to a bare column on SQLite ("WHERE NOT is_read"),
+# which SQLite cannot match to an index. The MySQL backend keeps "is_read = 0"
+# precisely so the index is used, so these are only meaningful there.
+BOOLEAN_FILTERED = {"notification feed", "notification badge"}
+
+
+def hot_queries():
+    """(name, queryset) for every query that runs on a hot path."""
+    medicine_ids = list(Medicine.objects.order_by("?").values_list("pk", flat=True)[:3])
+    inventory_id = Inventory.objects.all_items().values_list("pk", flat=True).first()
+    user_id = User.objects.values_list("pk", flat=True).first()
+    month = (timezone.now() - timedelta(days=60)).strftime("%Y-%m")
+    return [
+        ("FIFO batches of a basket", Inventory.objects.fifo_batches(medicine_ids)),
+        ("dashboard: low stock", stats.low_stock_queryset()[:6]),
+        ("dashboard: near expiry", stats.near_expiry_queryset()[:6]),
+        ("dashboard: expired", stats.expired_queryset()[:6]),
+        ("dashboard: recent transactions", stats.recent_transactions_queryset().order_by("-transaction_date", "-pk")[:6]),
+        ("inventory list", Inventory.objects.order_by("expiration_date", "pk")[:11]),
+        ("transaction list: month", Transaction.objects.filter(parse_transaction_query(month)[0])
+            .order_by("-transaction_date", "-pk")[:11]),
+        ("transaction list: user", Transaction.objects.filter(user_id=user_id).order_by("-transaction_date", "-pk")[:11]),
+        ("medicine transactions", Transaction.objects.filter(medicine_id=medicine_ids[0]).order_by("-transaction_date")[:20]),
+        ("notification feed", Notification.objects.filter(is_read=False).order_by("-created_at")[:10]),
+        ("notification badge", Notification.objects.filter(counted=True)),
+        ("batch movements", StockMovement.objects.filter(inventory_id=inventory_id).order_by("-created_at")[:20]),
+    ]
+
+
+def explain(queryset):
+    """(plan lines, full scans) of ``queryset`` on the current backend."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            lines = [row[3] for row in cursor.fetchall()]
+            # "SCAN t USING INDEX i" walks an index in order, "SCAN t" reads the table
+            scans = [line for line in lines if re.match(r"SCAN \w+$", line)]
+        elif connection.vendor == "mysql":
+            cursor.execute(f"EXPLAIN {sql}", params)
+            columns = [col[0] for col in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            lines = [f"{row['table']}: {row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}" for row in rows]
+            scans = [line for line, row in zip(lines, rows) if row["type"] == "ALL"]
+        elif connection.vendor == "postgresql":
+            cursor.execute(f"EXPLAIN {sql}", params)
+            lines = [row[0] for row in cursor.fetchall()]
+            scans = [line for line in lines if "Seq Scan" in line]
+        else:
+            raise CommandError(f"No EXPLAIN support for {connection.vendor}.")
+    return lines, scans
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN every hot query on a seeded throwaway database and fail if any "
+        "of them reads a whole table. Run it after touching queries or indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000, help="Inventory batches to seed (transactions: 3x)")
+        parser.add_argument(
+            "--current-db", action="store_true",
+            help="Explain against the configured database as it is, without creating and seeding a test one",
+        )
+        parser.add_argument("--noinput", action="store_false", dest="interactive")
+
+    def handle(self, *args, **opts):
+        if opts["current_db"]:
+            return self.check_plans(opts["verbosity"])
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=not opts["interactive"])
+        try:
+            self.seed(opts["rows"])
+            self.analyze()
+            self.check_plans(opts["verbosity"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, rows):
+        """A catalog shaped like production: most stock healthy, a few percent low or near expiry."""
+        rng = random.Random(0)
+        now = timezone.now()
+        today = now.date()
+        users = User.objects.bulk_create([User(username=f"plan{i}") for i in range(20)])
+        medicines = Medicine.objects.bulk_create([
+            Medicine(generic_name=f"Medicine {i}", dosage_form="Tablet", strength="500mg")
+            for i in range(max(1, rows // 20))
+        ])
+        Inventory.objects.bulk_create([
+            Inventory(
+                medicine=rng.choice(medicines),
+                batch_number=f"PLAN{i:07d}",
+                quantity=rng.randint(0, 10) if rng.random() < 0.03 else rng.randint(11, 500),
+                expiration_date=today + timedelta(days=rng.randint(-20, 1100)),
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+
+        transactions = Transaction.objects.bulk_create([
+            Transaction(
+                user=rng.choice(users),
+                medicine=rng.choice(medicines),
+                quantity_dispensed=rng.randint(1, 30),
+                status="dispensed",
+            )
+            for _ in range(rows * 3)
+        ], batch_size=1000)
+        for tx in transactions:  # spread over three years, auto_now_add stamped them all now
+            tx.transaction_date = now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+        Transaction.objects.bulk_update(transactions, ["transaction_date"], batch_size=1000)
+
+        batches = list(Inventory.objects.all_items().values_list("pk", flat=True))
+        Notification.objects.bulk_create([
+            Notification(inventory_id=pk, type="near_expiry", is_read=rng.random() > 0.05, counted=rng.random() < 0.02)
+            for pk in rng.sample(batches, min(len(batches), rows // 4))
+        ], batch_size=1000)
+        StockMovement.objects.bulk_create([
+            StockMovement(inventory_id=rng.choice(batches), delta=-rng.randint(1, 30), reason="dispense")
+            for _ in range(rows * 2)
+        ], batch_size=1000)
+
+    def analyze(self):
+        """Refresh the planner statistics, a freshly seeded table has none."""
+        tables = [model._meta.db_table for model in (Inventory, Transaction, Notification, StockMovement, Medicine)]
+        with connection.cursor() as cursor:
+            if connection.vendor == "mysql":
+                cursor.execute(f"ANALYZE TABLE {', '.join(tables)}")
+                cursor.fetchall()
+            else:
+                cursor.execute("ANALYZE")
+
+    def check_plans(self, verbosity):
+        regressions = []
+        for name, queryset in hot_queries():
+            if connection.vendor == "sqlite" and name in BOOLEAN_FILTERED:
+                self.stdout.write(f"{self.style.WARNING('skipped')}  {name} (boolean filter, not indexable on SQLite)")
+                continue
+            lines, scans = explain(queryset)
+            status = self.style.ERROR("FULL SCAN") if scans else self.style.SUCCESS("ok")
+            self.stdout.write(f"{status}  {name}")
+            if scans or verbosity > 1:
+                for line in lines:
+                    self.stdout.write(f"    {line}")
+            if scans:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} hot queries read a whole table: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index."))
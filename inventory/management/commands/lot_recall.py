@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from inventory.ledger import recall
+
+
+class Command(BaseCommand):
+    help = "List every transaction that consumed stock from a lot (batch number)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("batch_number", help="Lot / batch number, e.g. BN4821")
+
+    def handle(self, *args, **opts):
+        transactions = list(recall(opts["batch_number"]))
+        for tx in transactions:
+            self.stdout.write(
+                f"{tx.transaction_date:%Y-%m-%d %H:%M}  #{tx.pk}  "
+                f"{tx.batch_id or '-'}  {tx.medicine.generic_name}  x{tx.quantity_dispensed}  "
+                f"{tx.user.username if tx.user else '-'}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(transactions)} transaction(s) consumed lot {opts['batch_number']}."
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from inventory.models import Medicine, MedicineStockSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or with --verify, check) the per-medicine stock summaries against Inventory."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare stored summaries with Inventory and report drift",
+        )
+
+    def handle(self, *args, **opts):
+        if not opts["verify"]:
+            with transaction.atomic():
+                summaries = MedicineStockSummary.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {len(summaries)} stock summaries."))
+            return
+
+        medicine_ids = list(Medicine.objects.values_list("id", flat=True))
+        expected = MedicineStockSummary.compute(medicine_ids)
+        stored = MedicineStockSummary.objects.in_bulk(medicine_ids)
+
+        drift = 0
+        for medicine_id, fresh in expected.items():
+            current = stored.get(medicine_id)
+            for field in MedicineStockSummary.FIGURES:
+                have = getattr(current, field) if current else None
+                want = getattr(fresh, field)
+                if have != want:
+                    drift += 1
+                    self.stdout.write(f"Medicine #{medicine_id} {field}: stored {have}, actual {want}")
+
+        if drift:
+            raise CommandError(f"❌ {drift} stale figure(s), run rebuild_stock_summary to fix.")
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(expected)} stock summaries are up to date."))
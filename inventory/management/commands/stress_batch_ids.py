@@ -0,0 +1,62 @@
+import os
+import time
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from inventory.models import TransactionBatch
+
+
+def _allocate(count):
+    return [TransactionBatch.generate_batch_id() for _ in range(count)]
+
+
+def _create(count):
+    connection.close()  # never share the parent's DB connection after fork
+    batches = [TransactionBatch(batch_id=TransactionBatch.generate_batch_id()) for _ in range(count)]
+    TransactionBatch.objects.bulk_create(batches, batch_size=500)
+    connection.close()
+    return [b.batch_id for b in batches]
+
+
+class Command(BaseCommand):
+    help = "Stress the TransactionBatch id allocator across worker processes and check for collisions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=8)
+        parser.add_argument("--count", type=int, default=5000, help="Ids per process")
+        parser.add_argument(
+            "--db",
+            action="store_true",
+            help="Also insert the batches (primary key enforces uniqueness), deleted afterwards",
+        )
+        parser.add_argument(
+            "--node",
+            type=int,
+            help="Run with BATCH_ID_NODE set to this, as a deployment that configures it (all processes share it)",
+        )
+
+    def handle(self, *args, **opts):
+        processes, count = opts["processes"], opts["count"]
+        work = _create if opts["db"] else _allocate
+
+        if opts["node"] is not None:
+            os.environ["BATCH_ID_NODE"] = str(opts["node"])  # read by every forked process
+
+        start = time.perf_counter()
+        with get_context("fork").Pool(processes) as pool:
+            results = pool.map(work, [count] * processes)
+        elapsed = time.perf_counter() - start
+
+        ids = [batch_id for chunk in results for batch_id in chunk]
+        if opts["db"]:
+            TransactionBatch.objects.filter(batch_id__in=ids).delete()
+
+        collisions = len(ids) - len(set(ids))
+        unsorted = sum(1 for chunk in results for a, b in zip(chunk, chunk[1:]) if a >= b)
+        self.stdout.write(
+            f"{len(ids)} ids from {processes} processes in {elapsed:.2f}s ({len(ids) / elapsed:,.0f} ids/s)"
+        )
+        if collisions or unsorted:
+            raise CommandError(f"❌ {collisions} collision(s), {unsorted} out-of-order id(s) within a process")
+        self.stdout.write(self.style.SUCCESS("✅ No collisions, ids increase within every process"))
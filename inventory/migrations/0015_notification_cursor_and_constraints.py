@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:19
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_notifications(apps, schema_editor):
+    Notification = apps.get_model('inventory', 'Notification')
+    keep = (
+        Notification.objects.values('inventory', 'type')
+        .annotate(keep_id=Max('id'))
+        .values_list('keep_id', flat=True)
+    )
+    Notification.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_notification_message_notification_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_run', models.DateTimeField()),
+                ('near_expiry_until', models.DateField()),
+                ('expired_until', models.DateField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_read', '-created_at'], name='notif_unread_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['counted'], name='notif_counted_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_notifications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('inventory', 'type'), name='unique_notification_per_inventory_type'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:23
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def build_summaries(apps, schema_editor):
+    Inventory = apps.get_model('inventory', 'Inventory')
+    Medicine = apps.get_model('inventory', 'Medicine')
+    MedicineStockSummary = apps.get_model('inventory', 'MedicineStockSummary')
+
+    today = timezone.now().date()
+    horizon = today + timedelta(days=30)
+    sellable = Q(expiration_date__gte=today)
+    summaries = {
+        mid: MedicineStockSummary(medicine_id=mid)
+        for mid in Medicine.objects.values_list('id', flat=True)
+    }
+    rows = (
+        Inventory.objects.filter(quantity__gt=0)
+        .values('medicine_id')
+        .annotate(
+            sellable=Coalesce(Sum('quantity', filter=sellable), 0),
+            expired=Coalesce(Sum('quantity', filter=~sellable), 0),
+            near_expiry=Coalesce(Sum('quantity', filter=sellable & Q(expiration_date__lte=horizon)), 0),
+            batch_count=Count('id', filter=sellable),
+        )
+        .order_by()
+    )
+    for row in rows:
+        summaries[row['medicine_id']] = MedicineStockSummary(**row)
+    MedicineStockSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_notification_cursor_and_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicineStockSummary',
+            fields=[
+                ('medicine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_summary', serialize=False, to='inventory.medicine')),
+                ('sellable', models.PositiveIntegerField(default=0)),
+                ('expired', models.PositiveIntegerField(default=0)),
+                ('near_expiry', models.PositiveIntegerField(default=0)),
+                ('batch_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def opening_snapshots(apps, schema_editor):
+    # the ledger starts now, give every existing batch its opening quantity
+    Inventory = apps.get_model('inventory', 'Inventory')
+    StockSnapshot = apps.get_model('inventory', 'StockSnapshot')
+    now = timezone.now()
+    StockSnapshot.objects.bulk_create(
+        [
+            StockSnapshot(inventory_id=inv_id, quantity=quantity, taken_at=now)
+            for inv_id, quantity in Inventory.objects.values_list('id', 'quantity').iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_medicinestocksummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('receive', 'Received'), ('dispense', 'Dispensed'), ('adjust', 'Adjusted')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('taken_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['batch_number'], name='inventory_batch_number_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='inventory',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventory.inventory'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='transaction',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movements', to='inventory.transaction'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='inventory',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.inventory'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['inventory', '-created_at'], name='movement_batch_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['created_at'], name='movement_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['inventory', '-taken_at'], name='snapshot_batch_recent_idx'),
+        ),
+        migrations.RunPython(opening_snapshots, migrations.RunPython.noop),
+    ]
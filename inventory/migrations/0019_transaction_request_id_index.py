@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='request_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:05
+
+from django.db import migrations
+
+
+# Django has no FULLTEXT index type, so this lives outside the model state.
+# The ngram parser indexes character bigrams, which gives partial-word and
+# typo tolerant matches. Other backends use inventory.search.TrigramIndex.
+CREATE_FULLTEXT = (
+    'ALTER TABLE inventory_medicine ADD FULLTEXT INDEX medicine_fulltext_idx '
+    '(generic_name, brand_name, manufacturer) WITH PARSER ngram'
+)
+DROP_FULLTEXT = 'ALTER TABLE inventory_medicine DROP INDEX medicine_fulltext_idx'
+
+
+def create_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(CREATE_FULLTEXT)
+
+
+def drop_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(DROP_FULLTEXT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0020_cartline'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext, drop_fulltext),
+    ]
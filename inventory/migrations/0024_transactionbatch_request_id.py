@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+def backfill_request_ids(apps, schema_editor):
+    """Give each key that was already dispensed to its first batch, so retries keep seeing it."""
+    Transaction = apps.get_model('inventory', 'Transaction')
+    TransactionBatch = apps.get_model('inventory', 'TransactionBatch')
+    first_batch = {}
+    rows = (
+        Transaction.objects.exclude(request_id__isnull=True).exclude(request_id='')
+        .exclude(batch__isnull=True).order_by('batch_id').values_list('request_id', 'batch_id')
+    )
+    for request_id, batch_id in rows.iterator():
+        first_batch.setdefault(request_id, batch_id)
+
+    keyed = set()
+    for request_id, batch_id in first_batch.items():
+        if batch_id not in keyed:  # one key per batch
+            keyed.add(batch_id)
+            TransactionBatch.objects.filter(pk=batch_id).update(request_id=request_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0023_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionbatch',
+            name='request_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_request_ids, migrations.RunPython.noop),
+    ]
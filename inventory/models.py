@@ -1,8 +1,15 @@
+import uuid
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models import Sum
 from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from inventory import events
+
+NEAR_EXPIRY_DAYS = 30
 
 
 class Notification(models.Model):
@@ -16,6 +23,25 @@ class Notification(models.Model):
     def __str__(self):
         return f"Notification for {'Read' if self.is_read else 'Unread'}"
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["inventory", "type"], name="unique_notification_per_inventory_type"),
+        ]
+        indexes = [
+            models.Index(fields=["is_read", "-created_at"], name="notif_unread_recent_idx"),
+            models.Index(fields=["counted"], name="notif_counted_idx"),
+        ]
+
+
+class NotificationCursor(models.Model):
+    """High-water mark of the last notification sweep (single row)."""
+    last_run = models.DateTimeField()
+    near_expiry_until = models.DateField()
+    expired_until = models.DateField()
+
+    def __str__(self):
+        return f"Notification sweep @ {self.last_run}"
+
 class NotExpiredManager(models.Manager):
 
     def get_queryset(self):
@@ -32,6 +58,44 @@ class NotExpiredManager(models.Manager):
         today = timezone.now().date()
         return super().get_queryset().filter(expiration_date__lt=today)
 
+    def lock_for_dispense(self, medicine_ids):
+        """
+        Lock the sellable batches of ``medicine_ids`` (SELECT ... FOR UPDATE)
+        and return them in FIFO order per medicine. Rows are always locked in
+        the same (medicine, expiration_date, date_added, id) order so
+        concurrent dispensers queue up instead of deadlocking.
+        Must be called inside transaction.atomic().
+        """
+        return list(self.fifo_batches(medicine_ids).select_for_update())
+
+    def fifo_batches(self, medicine_ids):
+        """Sellable batches of ``medicine_ids``, oldest expiry first (served by inventory_fifo_idx)."""
+        return (
+            self.get_queryset()
+            .filter(medicine_id__in=medicine_ids, quantity__gt=0)
+            .order_by("medicine_id", "expiration_date", "date_added", "id")
+        )
+
+
+def allocate_fifo(batches, qty_needed):
+    """
+    Take ``qty_needed`` units from ``batches`` (already in FIFO order) in
+    memory and return ``(batch, units_taken)`` for every batch touched.
+    Raises ValueError if the batches do not hold enough stock.
+    """
+    changed = []
+    for inv in batches:
+        if qty_needed <= 0:
+            break
+        take = min(inv.quantity, qty_needed)
+        inv.quantity -= take
+        qty_needed -= take
+        changed.append((inv, take))
+
+    if qty_needed > 0:
+        raise ValueError("Not enough stock available!")
+    return changed
+
 class Classification(models.Model):
     label = models.CharField(max_length=100)
     ai_confidence_score = models.FloatField(null=True, blank=True)
@@ -71,23 +135,302 @@ class Inventory(models.Model):
     
     class Meta:
         verbose_name_plural = "Inventories"
+        indexes = [
+            models.Index(fields=["batch_number"], name="inventory_batch_number_idx"),
+            # FIFO allocation: a medicine's batches in expiry, then arrival order
+            models.Index(fields=["medicine", "expiration_date", "date_added"], name="inventory_fifo_idx"),
+            # dashboard panels and the inventory list
+            models.Index(fields=["expiration_date"], name="inventory_expiry_idx"),
+            models.Index(fields=["quantity"], name="inventory_low_stock_idx"),
+        ]
 
     objects = NotExpiredManager()
 
 
+class MedicineStockSummary(models.Model):
+    """
+    Denormalized stock figures per medicine so stock checks and lists are
+    primary-key lookups instead of aggregates over every batch.
+
+    Kept in step inside the writing transaction: dispenses update it from
+    the rows they locked, inventory saves/deletes rebuild it for that
+    medicine, and a daily task rolls batches over to near-expiry/expired.
+    """
+    medicine = models.OneToOneField(
+        Medicine,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stock_summary"
+    )
+    sellable = models.PositiveIntegerField(default=0)      # not expired
+    expired = models.PositiveIntegerField(default=0)
+    near_expiry = models.PositiveIntegerField(default=0)   # sellable, expiring within NEAR_EXPIRY_DAYS
+    batch_count = models.PositiveIntegerField(default=0)   # sellable batches with stock left
+    updated_at = models.DateTimeField(auto_now=True)
+
+    FIGURES = ["sellable", "expired", "near_expiry", "batch_count"]
+
+    def __str__(self):
+        return f"{self.medicine_id}: {self.sellable} sellable"
+
+    @classmethod
+    def sellable_for(cls, medicine_id):
+        return cls.objects.filter(pk=medicine_id).values_list("sellable", flat=True).first() or 0
+
+    @classmethod
+    def compute(cls, medicine_ids):
+        """Aggregate fresh (unsaved) summaries for ``medicine_ids`` from Inventory."""
+        today = timezone.now().date()
+        horizon = today + timedelta(days=NEAR_EXPIRY_DAYS)
+        sellable = Q(expiration_date__gte=today)
+
+        summaries = {mid: cls(medicine_id=mid) for mid in medicine_ids}
+        rows = (
+            Inventory.objects.all_items()
+            .filter(medicine_id__in=medicine_ids, quantity__gt=0)
+            .values("medicine_id")
+            .annotate(
+                sellable=Coalesce(Sum("quantity", filter=sellable), 0),
+                expired=Coalesce(Sum("quantity", filter=~sellable), 0),
+                near_expiry=Coalesce(Sum("quantity", filter=sellable & Q(expiration_date__lte=horizon)), 0),
+                batch_count=Count("id", filter=sellable),
+            )
+            .order_by()
+        )
+        for row in rows:
+            summaries[row["medicine_id"]] = cls(**row)
+        return summaries
+
+    @classmethod
+    def rebuild(cls, medicine_ids=None):
+        """Recompute and upsert the summaries of ``medicine_ids`` (all medicines by default)."""
+        if medicine_ids is None:
+            medicine_ids = list(Medicine.objects.values_list("id", flat=True))
+        summaries = cls.compute(medicine_ids)
+        # MySQL cannot upsert on a conflict target: add the missing rows, then update all
+        cls.objects.bulk_create(summaries.values(), ignore_conflicts=True)
+        cls._update(summaries.values(), cls.FIGURES)
+        return summaries
+
+    @classmethod
+    def _update(cls, summaries, fields):
+        now = timezone.now()
+        for summary in summaries:
+            summary.updated_at = now  # bulk_update skips auto_now
+        cls.objects.bulk_update(summaries, fields + ["updated_at"])
+
+    @classmethod
+    def apply_locked_batches(cls, batches_by_medicine):
+        """
+        Refresh the sellable figures from the batches a dispense locked and
+        updated in memory. Dispensing never touches expired batches, so
+        ``expired`` is left as is. Medicines without a summary yet get a
+        full one, expired stock included.
+        """
+        existing = set(cls.objects.filter(pk__in=batches_by_medicine).values_list("pk", flat=True))
+        missing = [medicine_id for medicine_id in batches_by_medicine if medicine_id not in existing]
+        if missing:
+            cls.rebuild(missing)  # the batches are already saved
+
+        horizon = timezone.now().date() + timedelta(days=NEAR_EXPIRY_DAYS)
+        summaries = [
+            cls(
+                medicine_id=medicine_id,
+                sellable=sum(inv.quantity for inv in batches),
+                near_expiry=sum(inv.quantity for inv in batches if inv.expiration_date <= horizon),
+                batch_count=sum(1 for inv in batches if inv.quantity > 0),
+            )
+            for medicine_id, batches in batches_by_medicine.items()
+            if medicine_id in existing
+        ]
+        if summaries:
+            cls._update(summaries, ["sellable", "near_expiry", "batch_count"])
+
+
+class StockReservation(models.Model):
+    """
+    Stock held for one line of a user's cart until it is checked out,
+    removed, or ``TTL`` passes without the cart being touched.
+    The id is the cart line id.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="reservations")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="reservations")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    TTL = timedelta(minutes=15)
+
+    def __str__(self):
+        return f"{self.quantity} of {self.medicine_id} for {self.user_id} until {self.expires_at}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["medicine", "expires_at"], name="reservation_active_idx"),
+            models.Index(fields=["expires_at"], name="reservation_expiry_idx"),
+        ]
+
+    @classmethod
+    def active(cls):
+        return cls.objects.filter(expires_at__gt=timezone.now())
+
+    @classmethod
+    def available_for(cls, medicine_id):
+        """Available to promise: sellable stock minus what other carts hold."""
+        return cls.available_for_many([medicine_id])[medicine_id]
+
+    @classmethod
+    def available_for_many(cls, medicine_ids):
+        """``available_for`` of many medicines in two queries, as {medicine_id: units}."""
+        sellable = dict(
+            MedicineStockSummary.objects.filter(pk__in=medicine_ids).values_list("medicine_id", "sellable")
+        )
+        reserved = dict(
+            cls.active().filter(medicine_id__in=medicine_ids)
+            .values_list("medicine_id").annotate(total=Sum("quantity")).order_by()
+        )
+        return {mid: sellable.get(mid, 0) - reserved.get(mid, 0) for mid in medicine_ids}
+
+    @classmethod
+    def reserve(cls, user, medicine_id, quantity, line_id):
+        """
+        Hold ``quantity`` of a medicine for a cart line.
+        Raises ValueError when not enough stock is left to promise.
+        """
+        with transaction.atomic():
+            # serialize reservations of the same medicine on its summary row
+            list(MedicineStockSummary.objects.select_for_update().filter(pk=medicine_id))
+            available = cls.available_for(medicine_id)
+            if quantity > available:
+                raise ValueError(f"Not enough stock. Available: {max(available, 0)}")
+            return cls.objects.create(
+                id=line_id,
+                user=user,
+                medicine_id=medicine_id,
+                quantity=quantity,
+                expires_at=timezone.now() + cls.TTL,
+            )
+
+    @classmethod
+    def claim(cls, user_id, medicine_ids):
+        """
+        For a dispense by ``user_id`` that holds the batch locks of
+        ``medicine_ids``: lock their summaries so no cart reserves meanwhile,
+        release the user's own reservations of them and return what other
+        carts still hold, as {medicine_id: units}.
+        """
+        list(MedicineStockSummary.objects.select_for_update().filter(pk__in=medicine_ids).order_by("pk"))
+        cls.objects.filter(user_id=user_id, medicine_id__in=medicine_ids).delete()
+        return dict(
+            cls.active().filter(medicine_id__in=medicine_ids)
+            .values_list("medicine_id").annotate(total=Sum("quantity")).order_by()
+        )
+
+    @classmethod
+    def touch(cls, line_ids):
+        """Keep an active cart's reservations alive."""
+        return cls.active().filter(id__in=line_ids).update(expires_at=timezone.now() + cls.TTL)
+
+    @classmethod
+    def release(cls, line_ids):
+        return cls.objects.filter(id__in=line_ids).delete()[0]
+
+    @classmethod
+    def expire(cls):
+        """Drop abandoned reservations in one statement."""
+        return cls.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+
+class CartLine(models.Model):
+    """A pending line in a user's order cart, see inventory.cart.Cart."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="cart_lines")
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="cart_lines")
+    quantity_dispensed = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.quantity_dispensed} of {self.medicine_id} in {self.user_id}'s cart"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="cartline_user_idx"),
+        ]
+
+
 class TransactionBatch(models.Model):
     batch_id = models.CharField(max_length=30, primary_key=True)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     remarks = models.TextField(blank=True)
+    # idempotency key of an API dispense; unique, so two retries racing each other dispense once
+    request_id = models.CharField(max_length=100, blank=True, null=True, unique=True)
 
     def __str__(self):
         return f"Batch {self.batch_id}"
 
     @staticmethod
     def generate_batch_id():
-        from django.utils import timezone
-        return "TX" + timezone.now().strftime("%Y%m%d%H%M%S")
+        from inventory.ids import batch_ids
+        return batch_ids.next_id()
+
+    def dispense(self, transactions):
+        """
+        Dispense a whole basket of unsaved ``Transaction`` objects at once.
+
+        The batches of every medicine in the basket are locked together in
+        one query, lines are allocated FIFO in basket order (repeated lines
+        of the same medicine draw from the same running stock), then the
+        transactions are bulk-created and the inventory bulk-updated. The
+        number of queries does not grow with the number of lines.
+        Stock other users' carts reserve is not available, the dispensing
+        user's own reservations of these medicines are released.
+        Raises ValueError if any medicine runs out; nothing is written then.
+        """
+        with transaction.atomic():
+            medicine_ids = sorted({tx.medicine_id for tx in transactions})
+            batches_by_medicine = {}
+            for inv in Inventory.objects.lock_for_dispense(medicine_ids):
+                batches_by_medicine.setdefault(inv.medicine_id, []).append(inv)
+            reserved = StockReservation.claim(self.user_id, medicine_ids)
+
+            changed = {}
+            taken = []  # (transaction, batch, units) for the ledger
+            for tx in transactions:
+                batches = batches_by_medicine.get(tx.medicine_id, [])
+                tx.batch = self
+                tx.status = "dispensed"
+                tx.stock_before = sum(inv.quantity for inv in batches)
+                available = tx.stock_before - reserved.get(tx.medicine_id, 0)
+                if tx.quantity_dispensed > available:
+                    raise ValueError(
+                        f"Not enough stock for medicine #{tx.medicine_id}. "
+                        f"Available: {max(available, 0)}, requested: {tx.quantity_dispensed}"
+                    )
+                for inv, units in allocate_fifo(batches, tx.quantity_dispensed):
+                    changed[inv.pk] = inv
+                    taken.append((tx, inv, units))
+                tx.stock_after = tx.stock_before - tx.quantity_dispensed
+
+            now = timezone.now()
+            for inv in changed.values():
+                inv.last_updated = now  # bulk_update skips auto_now
+            Inventory.objects.bulk_update(changed.values(), ["quantity", "last_updated"])
+            MedicineStockSummary.apply_locked_batches(batches_by_medicine)
+            created = Transaction.objects.bulk_create(transactions)
+            if created and created[0].pk is None:
+                # backends without RETURNING (MySQL): rows were inserted in order
+                pks = list(self.transactions.order_by("-pk").values_list("pk", flat=True)[:len(created)])
+                for tx, pk in zip(created, reversed(pks)):
+                    tx.pk = pk
+            StockMovement.objects.bulk_create([
+                StockMovement(inventory=inv, transaction=tx, delta=-units, reason="dispense", created_at=now)
+                for tx, inv, units in taken
+            ])
+
+        events.publish(events.INVENTORY, events.TRANSACTIONS)
+        return created
 
 class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
@@ -107,7 +450,7 @@ class Transaction(models.Model):
     )
     medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="transactions")
     quantity_dispensed = models.PositiveIntegerField()
-    transaction_date = models.DateTimeField(auto_now_add=True)
+    transaction_date = models.DateTimeField(auto_now_add=True, db_index=True)
     remarks = models.TextField(blank=True)
     status = models.CharField(
         max_length=50,
@@ -126,49 +469,105 @@ class Transaction(models.Model):
         blank=True,
         related_name="transactions"
     )
-    request_id = models.CharField(max_length=100, blank=True, null=True) #NOSONAR
+    request_id = models.CharField(max_length=100, blank=True, null=True, db_index=True) #NOSONAR
     stock_before = models.PositiveIntegerField(null=True, blank=True)
     stock_after = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.quantity_dispensed} of {self.medicine} by {self.user}"
+
+    class Meta:
+        indexes = [
+            # a medicine's or a user's transactions, newest first
+            models.Index(fields=["medicine", "-transaction_date"], name="tx_medicine_recent_idx"),
+            models.Index(fields=["user", "-transaction_date"], name="tx_user_recent_idx"),
+        ]
     
     def dispense(self):
         """
         Deducts stock using FIFO when transaction is marked dispensed.
+
+        The candidate batches are locked, the allocation is done in memory
+        and every touched batch is written back with a single bulk_update,
+        so two counters can never sell the same units. Stock other users'
+        carts reserve is not available.
         """
         if self.status != "dispensed":
             return  # only deduct when status is dispensed
 
-        qty_needed = self.quantity_dispensed
-        inventories = Inventory.objects.filter(
-            medicine=self.medicine,
-            quantity__gt=0
-        ).order_by("expiration_date", "date_added")  # FIFO
+        with transaction.atomic():
+            batches = Inventory.objects.lock_for_dispense([self.medicine_id])
+            reserved = StockReservation.claim(self.user_id, [self.medicine_id])
+            self.stock_before = sum(inv.quantity for inv in batches)
+            if self.quantity_dispensed > self.stock_before - reserved.get(self.medicine_id, 0):
+                raise ValueError("Not enough stock available!")
+
+            changed = allocate_fifo(batches, self.quantity_dispensed)
+            now = timezone.now()
+            for inv, _ in changed:
+                inv.last_updated = now  # bulk_update skips auto_now
+            Inventory.objects.bulk_update([inv for inv, _ in changed], ["quantity", "last_updated"])
+            MedicineStockSummary.apply_locked_batches({self.medicine_id: batches})
 
-        total_available = inventories.aggregate(total=Sum("quantity"))["total"] or 0
-        self.stock_before = total_available
+            self.stock_after = self.stock_before - self.quantity_dispensed
+            self.save()
+            StockMovement.objects.bulk_create([
+                StockMovement(inventory=inv, transaction=self, delta=-units, reason="dispense", created_at=now)
+                for inv, units in changed
+            ])
 
-        if total_available < qty_needed:
-            raise ValueError("Not enough stock available!")
+        events.publish(events.INVENTORY, events.TRANSACTIONS)
 
-        with transaction.atomic():
-            for inv in inventories:
-                if qty_needed <= 0:
-                    break
-                if inv.quantity <= qty_needed:
-                    qty_needed -= inv.quantity
-                    inv.quantity = 0
-                else:
-                    inv.quantity -= qty_needed
-                    qty_needed = 0
-                inv.save()
-
-        # Save final stock_after
-        remaining = inventories.aggregate(total=Sum("quantity"))["total"] or 0
-        self.stock_after = remaining
-        self.save()
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger of every change to a batch's quantity. Rows are
+    never updated or deleted, current and past stock can be rebuilt from
+    them (see inventory.ledger).
+    """
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name="movements")
+    transaction = models.ForeignKey(
+        Transaction,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="movements"
+    )
+    delta = models.IntegerField()
+    reason = models.CharField(
+        max_length=20,
+        choices=[
+            ("receive", "Received"),
+            ("dispense", "Dispensed"),
+            ("adjust", "Adjusted"),
+        ],
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.delta:+} {self.inventory_id} ({self.reason})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["inventory", "-created_at"], name="movement_batch_history_idx"),
+            models.Index(fields=["created_at"], name="movement_created_idx"),
+        ]
+
+
+class StockSnapshot(models.Model):
+    """Quantity of a batch at ``taken_at``, so history needs only recent movements."""
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name="snapshots")
+    quantity = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.inventory_id}: {self.quantity} @ {self.taken_at}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["inventory", "-taken_at"], name="snapshot_batch_recent_idx"),
+        ]
 
 
 class AuditLog(models.Model):
@@ -0,0 +1,124 @@
+# inventory/notifications.py
+
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from inventory import events, stats
+from inventory.cache_versions import bump_version, current_version
+from inventory.models import NEAR_EXPIRY_DAYS, Inventory, Notification, NotificationCursor
+
+logger = logging.getLogger(__name__)
+
+FEED_SIZE = 10  # newest unread notifications shown in the bell dropdown
+FEED_TTL = 5  # seconds, the page header tolerates being this stale
+FEED_VERSION_KEY = "notifications:feed:version"
+
+
+def _new_notifications(queryset, type, message):
+    """Build unsaved notifications for (id, expiration_date, generic_name) rows."""
+    return [
+        Notification(
+            inventory_id=inv_id,
+            type=type,
+            message=message.format(name=name, date=expiration_date),
+            counted=True,
+            is_read=False,
+        )
+        for inv_id, expiration_date, name in queryset.values_list(
+            "id", "expiration_date", "medicine__generic_name"
+        )
+    ]
+
+
+def sync_notifications():
+    """
+    Incrementally create near-expiry / expired notifications and withdraw
+    the ones whose batch has been depleted.
+
+    Only batches that crossed a threshold since the last sweep, or were
+    edited since then, are looked at. The first sweep does a full scan.
+    """
+    now = timezone.now()
+    today = now.date()
+    horizon = today + timedelta(days=NEAR_EXPIRY_DAYS)
+
+    with transaction.atomic():
+        cursor = NotificationCursor.objects.select_for_update().filter(pk=1).first()
+
+        in_stock = Inventory.objects.all_items().filter(quantity__gt=0)
+        near_expiry_qs = in_stock.filter(expiration_date__gte=today, expiration_date__lte=horizon)
+        expired_qs = in_stock.filter(expiration_date__lt=today)
+        depleted_qs = Notification.objects.filter(inventory__quantity=0)
+
+        if cursor is not None:
+            changed = Q(last_updated__gt=cursor.last_run)
+            near_expiry_qs = near_expiry_qs.filter(Q(expiration_date__gt=cursor.near_expiry_until) | changed)
+            expired_qs = expired_qs.filter(Q(expiration_date__gte=cursor.expired_until) | changed)
+            depleted_qs = depleted_qs.filter(inventory__last_updated__gt=cursor.last_run)
+
+        notifications = _new_notifications(
+            near_expiry_qs, "near_expiry", "{name} will expire on {date}"
+        ) + _new_notifications(
+            expired_qs, "expired", "{name} has expired!"
+        )
+        # the (inventory, type) unique constraint drops the ones we already have
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+        withdrawn, _ = depleted_qs.delete()
+        if notifications or withdrawn:
+            events.publish(events.NOTIFICATIONS)
+
+        NotificationCursor.objects.update_or_create(
+            pk=1,
+            defaults={
+                "last_run": now,
+                "near_expiry_until": horizon,
+                "expired_until": today,
+            },
+        )
+
+    return {"candidates": len(notifications), "withdrawn": withdrawn}
+
+
+def notification_feed():
+    """
+    What the page header shows: the bell badge count, the unread total and
+    the newest FEED_SIZE unread notifications. Shared by every page through
+    a short-lived cache that notification changes invalidate; a cache that
+    fails counts as a miss.
+    """
+    try:
+        key = f"notifications:feed:{current_version(FEED_VERSION_KEY)}"
+        feed = cache.get(key)
+    except Exception as e:
+        logger.warning("Notification feed cache unavailable: %s", e)
+        key = feed = None
+    if feed is None:
+        feed = {
+            **stats.notification_counters(),
+            "latest": list(
+                Notification.objects.filter(is_read=False)
+                .select_related("inventory__medicine")
+                .order_by("-created_at")[:FEED_SIZE]
+            ),
+        }
+        if key is not None:
+            try:
+                cache.set(key, feed, FEED_TTL)
+            except Exception as e:
+                logger.warning("Notification feed not cached: %s", e)
+    return feed
+
+
+def _bump_feed_version():
+    bump_version(FEED_VERSION_KEY)
+
+
+def invalidate_feed(topics=None):
+    """Drop the cached feed once the current DB transaction commits."""
+    if topics is None or events.NOTIFICATIONS in topics:
+        transaction.on_commit(_bump_feed_version, robust=True)
@@ -0,0 +1,206 @@
+# inventory/pagination.py
+
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections, router
+from django.db.models import Q
+
+
+def estimated_count(model):
+    """
+    Row count of the model's table from the database statistics, without
+    scanning it. None when the backend keeps no such estimate.
+    """
+    connection = connections[router.db_for_read(model)]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:  # postgres reports -1 before the first ANALYZE
+        return None
+    return int(row[0])
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage(Sequence):
+    """One page of a KeysetPaginator, usable like a Django Page in templates."""
+
+    def __init__(self, object_list, paginator, cursor, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor  # the cursor that produced this page, "" for the first one
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f"<KeysetPage of {len(self)} items>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return ""
+        return self.paginator.encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return ""
+        return self.paginator.encode_cursor(self.object_list[0], backwards=True)
+
+    @property
+    def estimated_total(self):
+        return self.paginator.estimated_total
+
+
+class KeysetPaginator:
+    """
+    Seek pagination: each page is fetched with a WHERE on the ordering
+    columns of the row it continues from, instead of COUNT(*) plus an
+    OFFSET that grows with the page number.
+
+    The queryset ordering must be on non-null local fields. The primary
+    key is appended as a tiebreaker so rows sharing a value are neither
+    skipped nor repeated. Cursors are opaque strings; a malformed one
+    falls back to the first page, like Paginator.get_page does.
+    """
+
+    def __init__(self, queryset, per_page, estimate_total=False):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.estimate_total = estimate_total
+        self.model = queryset.model
+
+        ordering = list(queryset.query.order_by) or list(self.model._meta.ordering)
+        if not ordering:
+            raise ValueError("KeysetPaginator needs an ordered queryset.")
+        self.keys = []
+        for name in ordering:
+            descending = name.startswith("-")
+            self.keys.append((self._field(name.lstrip("-")), descending))
+        pk = self.model._meta.pk
+        if self.keys[-1][0] != pk:
+            self.keys.append((pk, self.keys[0][1]))
+
+    def _field(self, name):
+        if name == "pk":
+            return self.model._meta.pk
+        try:
+            return self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise ValueError(f"KeysetPaginator cannot order on {name!r}.")
+
+    def _ordering(self, backwards):
+        return [
+            f"{'-' if descending != backwards else ''}{field.attname}"
+            for field, descending in self.keys
+        ]
+
+    def encode_cursor(self, obj, backwards=False):
+        payload = {"k": [field.value_to_string(obj) for field, _ in self.keys]}
+        if backwards:
+            payload["b"] = 1
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            values = payload["k"]
+            if len(values) != len(self.keys):
+                raise InvalidCursor(cursor)
+            values = [field.to_python(value) for (field, _), value in zip(self.keys, values)]
+        except (binascii.Error, ValueError, TypeError, KeyError, ValidationError):
+            raise InvalidCursor(cursor)
+        return values, bool(payload.get("b"))
+
+    def _seek(self, values, backwards):
+        # (a, b, pk) > (va, vb, vpk) spelled out per column, so it also works
+        # for mixed directions. The bound on the leading column alone lets
+        # the planner use a range scan on its index.
+        condition = Q()
+        for i, (field, descending) in enumerate(self.keys):
+            lookup = "lt" if descending != backwards else "gt"
+            clause = Q(**{f"{field.attname}__{lookup}": values[i]})
+            for (prior, _), value in zip(self.keys[:i], values):
+                clause &= Q(**{prior.attname: value})
+            condition |= clause
+        lead, descending = self.keys[0]
+        bound = Q(**{f"{lead.attname}__{'lte' if descending != backwards else 'gte'}": values[0]})
+        return bound & condition
+
+    def page(self, cursor=None):
+        if not cursor:
+            rows = list(self.queryset.order_by(*self._ordering(False))[: self.per_page + 1])
+            return KeysetPage(rows[: self.per_page], self, "", len(rows) > self.per_page, False)
+
+        values, backwards = self.decode_cursor(cursor)
+        queryset = self.queryset.filter(self._seek(values, backwards)).order_by(*self._ordering(backwards))
+        rows = list(queryset[: self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backwards:
+            rows.reverse()
+            return KeysetPage(rows, self, cursor, True, more)
+        return KeysetPage(rows, self, cursor, more, True)
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    @property
+    def estimated_total(self):
+        """
+        Approximate size of the list from the table statistics, only for an
+        unfiltered queryset where the table size is the answer.
+        """
+        if not self.estimate_total or self.queryset.query.where:
+            return None
+        if not hasattr(self, "_estimated_total"):
+            self._estimated_total = estimated_count(self.model)
+        return self._estimated_total
+
+
+class KeysetPaginationMixin:
+    """ListView mixin that swaps Django's Paginator for a KeysetPaginator."""
+
+    cursor_kwarg = "cursor"
+    estimate_total = False
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, estimate_total=self.estimate_total)
+        page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        return (paginator, page, page.object_list, page.has_other_pages())
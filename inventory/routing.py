@@ -0,0 +1,8 @@
+# inventory/routing.py
+
+from django.urls import path
+from inventory.consumers import LiveUpdatesConsumer
+
+websocket_urlpatterns = [
+    path("ws/live/", LiveUpdatesConsumer.as_asgi()),
+]
@@ -0,0 +1,378 @@
+# inventory/search.py
+
+import calendar
+import heapq
+import logging
+import operator
+import re
+from functools import reduce
+import threading
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Count, IntegerField, Q, When
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from inventory.cache_versions import bump_version, current_version
+from inventory.models import Medicine, Transaction
+
+logger = logging.getLogger(__name__)
+
+SEARCH_LIMIT = 200  # medicines ranked, and listed by autocomplete; filters take every match
+MIN_SIMILARITY = 0.5  # share of the query's trigrams a match must contain
+VERSION_KEY = "search:medicines:version"
+
+HOT_SET_SIZE = 20  # medicines offered before anything is typed
+HOT_SET_DAYS = 30
+HOT_SET_TTL = 600  # seconds
+HOT_SET_KEY = "search:medicines:hot"
+
+SEARCH_FIELDS = ("generic_name", "brand_name", "manufacturer")
+
+# matches the medicine_fulltext_idx created by migration 0021 (MySQL only). In
+# natural language mode one shared bigram is a match, every word is required here.
+FULLTEXT_MATCH = "MATCH (generic_name, brand_name, manufacturer) AGAINST (%s IN BOOLEAN MODE)"
+
+_words = re.compile(r"\w+")
+
+
+def _tokens(text):
+    return _words.findall(text.lower())
+
+
+def trigrams(text):
+    """pg_trgm style trigrams: every word padded with two leading and one trailing blank."""
+    grams = set()
+    for word in _tokens(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    In-memory trigram index over the medicine catalog, for backends without
+    a usable full-text index. Matches tolerate typos (a misspelt word still
+    shares most of its trigrams) and words typed only partly.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._postings = defaultdict(set)  # trigram -> medicine ids
+        self._docs = {}  # medicine id -> (trigrams, words)
+        self._lock = threading.Lock()
+        self._building = False
+
+    def _text(self, row):
+        return " ".join(value or "" for value in row)
+
+    def rebuild(self, version):
+        postings, docs = defaultdict(set), {}
+        for pk, *row in Medicine.objects.values_list("pk", *SEARCH_FIELDS).iterator():
+            text = self._text(row)
+            grams = trigrams(text)
+            docs[pk] = (grams, tuple(_tokens(text)))
+            for gram in grams:
+                postings[gram].add(pk)
+        with self._lock:
+            self._postings, self._docs, self.version = postings, docs, version
+
+    def refresh_in_background(self, version):
+        """Rebuild in a thread of its own, searches keep using the current index meanwhile."""
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._refresh, args=(version,), name="medicine-index", daemon=True).start()
+
+    def _refresh(self, version):
+        try:
+            self.rebuild(version)
+        except Exception:
+            logger.exception("Could not rebuild the medicine search index")
+        finally:
+            self._building = False
+            connection.close()  # this thread's own connection
+
+    def add(self, pk, row):
+        text = self._text(row)
+        grams = trigrams(text)
+        with self._lock:
+            self._discard(pk)
+            self._docs[pk] = (grams, tuple(_tokens(text)))
+            for gram in grams:
+                self._postings[gram].add(pk)
+
+    def remove(self, pk):
+        with self._lock:
+            self._discard(pk)
+
+    def _discard(self, pk):
+        grams, _ = self._docs.pop(pk, (set(), ()))
+        for gram in grams:
+            self._postings[gram].discard(pk)
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Medicine ids ranked by trigram overlap, whole-word and prefix hits first; ``limit=None`` for all."""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        query_words = _tokens(query)
+
+        with self._lock:
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self._postings.get(gram, ()))
+            docs = self._docs
+
+            scored = []
+            for pk, hits in shared.items():
+                similarity = hits / len(query_grams)
+                if similarity < MIN_SIMILARITY:
+                    continue
+                words = docs[pk][1]
+                prefix_hits = sum(any(word.startswith(q) for word in words) for q in query_words)
+                scored.append((prefix_hits, similarity, -len(words), -pk))
+        best = sorted(scored, reverse=True) if limit is None else heapq.nlargest(limit, scored)
+        return [-key[3] for key in best]
+
+
+_index = TrigramIndex()
+
+
+def _current_version():
+    return current_version(VERSION_KEY)
+
+
+def _contains_search(query, limit):
+    """Plain substring match, only while this process builds its first index."""
+    words = _tokens(query)
+    if not words:
+        return []
+    condition = Q()
+    for word in words:
+        condition &= reduce(operator.or_, (Q(**{f"{field}__icontains": word}) for field in SEARCH_FIELDS))
+    return list(Medicine.objects.filter(condition).order_by("generic_name").values_list("pk", flat=True)[:limit])
+
+
+def _trigram_search(query, limit):
+    try:
+        version = _current_version()
+    except Exception as e:
+        logger.warning("Search index version unavailable: %s", e)
+        version = _index.version  # serve what this process has
+    if _index.version != version:
+        # another process changed the catalog, or nothing was built yet
+        _index.refresh_in_background(version)
+    if _index.version is None:
+        return _contains_search(query, limit)
+    return _index.search(query, limit)
+
+
+def boolean_query(query):
+    """``query`` as a BOOLEAN MODE search that requires every word, operators dropped."""
+    return " ".join(f"+{word}" for word in _tokens(query))
+
+
+def _fulltext_search(query, limit):
+    query = boolean_query(query)
+    if not query:
+        return []
+    return list(
+        Medicine.objects.annotate(score=RawSQL(FULLTEXT_MATCH, (query,)))
+        .filter(score__gt=0)
+        .order_by("-score", "pk")
+        .values_list("pk", flat=True)[:limit]
+    )
+
+
+def search_medicine_ids(query, limit=SEARCH_LIMIT):
+    """
+    Ids of the medicines matching ``query``, best match first. Pass
+    ``limit=None`` when filtering by them, so no match is left out.
+    """
+    query = query.strip()
+    if not query:
+        return []
+    if connection.vendor == "mysql":
+        return _fulltext_search(query, limit)
+    return _trigram_search(query, limit)
+
+
+def ranked(queryset, ids):
+    """
+    Filter ``queryset`` to ``ids`` and keep their rank order. Past the first
+    SEARCH_LIMIT the queryset's own order applies.
+    """
+    if not ids:
+        return queryset.none()
+    top = ids[:SEARCH_LIMIT]
+    rank = Case(
+        *[When(pk=pk, then=pos) for pos, pk in enumerate(top)], default=len(top), output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ids).order_by(rank, *queryset.query.order_by)
+
+
+def hot_medicine_ids():
+    """
+    The most dispensed medicines of the last HOT_SET_DAYS, topped up
+    alphabetically. Cached, it only changes slowly; a cache that fails
+    counts as a miss.
+    """
+    try:
+        ids = cache.get(HOT_SET_KEY)
+    except Exception as e:
+        logger.warning("Search cache unavailable: %s", e)
+        ids = None
+    if ids is None:
+        since = timezone.now() - timedelta(days=HOT_SET_DAYS)
+        ids = list(
+            Transaction.objects.filter(transaction_date__gte=since)
+            .values("medicine")
+            .annotate(dispensed=Count("pk"))
+            .order_by("-dispensed", "medicine")
+            .values_list("medicine", flat=True)[:HOT_SET_SIZE]
+        )
+        if len(ids) < HOT_SET_SIZE:
+            ids += Medicine.objects.exclude(pk__in=ids).order_by("generic_name").values_list(
+                "pk", flat=True
+            )[: HOT_SET_SIZE - len(ids)]
+        try:
+            cache.set(HOT_SET_KEY, ids, HOT_SET_TTL)
+        except Exception as e:
+            logger.warning("Hot medicines not cached: %s", e)
+    return ids
+
+
+def medicine_changed(medicine, deleted=False):
+    """Keep the in-process index current and make other processes rebuild theirs."""
+    if connection.vendor == "mysql":
+        return  # the FULLTEXT index is maintained by the database
+
+    pk = medicine.pk
+    row = tuple(getattr(medicine, field) for field in SEARCH_FIELDS)
+
+    def apply():
+        expected = _index.version
+        version = bump_version(VERSION_KEY)
+        if expected is None:
+            return  # this process has not searched yet, nothing to keep current
+        if version != expected + 1:
+            _index.refresh_in_background(version)  # missed other changes
+            return
+        if deleted:
+            _index.remove(pk)
+        else:
+            _index.add(pk, row)
+        _index.version = version
+
+    transaction.on_commit(apply, robust=True)
+
+
+# Transaction list search: every token becomes a predicate an index can serve
+#
+#   2024-03-05            that day
+#   2024-03               that month
+#   2024-01..2024-03-15   a range, either side may be left out; years work here too
+#   TX2024... / tx2024    batch id, exact when complete, otherwise a prefix
+#   @maria                username prefix
+#   12                    quantity dispensed
+#   dispensed             status
+#   anything else         medicine, through the ranked medicine search
+#
+# Tokens are ANDed.
+
+_date_token = re.compile(r"^(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?$")
+_STATUSES = {value for value, _ in Transaction._meta.get_field("status").choices}
+BATCH_ID_LENGTH = 30  # ids from before the node was widened have 26, a prefix search finds those
+
+
+def _parse_day_span(token, allow_year):
+    """(first day, day after the last) covered by a date token, or None."""
+    match = _date_token.match(token)
+    if not match:
+        return None
+    year, month, day = (int(part) if part else None for part in match.groups())
+    if month is None and not allow_year:
+        return None  # a bare 4 digit number is a quantity
+    try:
+        if day is not None:
+            start = date(year, month, day)
+            return start, start + timedelta(days=1)
+        if month is not None:
+            start = date(year, month, 1)
+            return start, start + timedelta(days=calendar.monthrange(year, month)[1])
+        return date(year, 1, 1), date(year + 1, 1, 1)
+    except ValueError:  # 2024-13-01, 2024-02-30 ...
+        return None
+
+
+def _date_range(token):
+    """(start, end) days of a date or date range token, either may be None; or None."""
+    if ".." not in token:
+        return _parse_day_span(token, allow_year=False)
+    low, high = token.split("..", 1)
+    if not low and not high:
+        return None
+    start = _parse_day_span(low, allow_year=True) if low else (None, None)
+    end = _parse_day_span(high, allow_year=True) if high else (None, None)
+    if start is None or end is None:
+        return None
+    if start[0] and end[0] and start[0] > end[0]:  # typed backwards
+        start, end = end, start
+    return start[0], end[1]
+
+
+def _as_datetime(day):
+    return timezone.make_aware(datetime.combine(day, time.min)) if day else None
+
+
+def parse_transaction_query(text):
+    """
+    Turn the transaction list search box into ``(Q, filters)``. ``filters``
+    describes how every token was read, for showing it back to the user.
+    """
+    condition = Q()
+    filters = []
+    words = []
+
+    for token in text.split():
+        lowered = token.lower()
+        span = _date_range(token)
+        if span is not None:
+            start, end = span
+            if start:
+                condition &= Q(transaction_date__gte=_as_datetime(start))
+            if end:
+                condition &= Q(transaction_date__lt=_as_datetime(end))
+            last = end - timedelta(days=1) if end else None
+            filters.append(f"date {start or '…'} to {last or '…'}")
+        elif lowered.startswith("tx") and len(token) > 2:
+            batch_id = token.upper()
+            if len(batch_id) == BATCH_ID_LENGTH:
+                condition &= Q(batch_id=batch_id)
+                filters.append(f"transaction {batch_id}")
+            else:
+                condition &= Q(batch__batch_id__startswith=batch_id)
+                filters.append(f"transaction {batch_id}…")
+        elif token.startswith("@") and len(token) > 1:
+            condition &= Q(user__username__istartswith=token[1:])
+            filters.append(f"user {token[1:]}…")
+        elif token.isdigit():
+            condition &= Q(quantity_dispensed=int(token))
+            filters.append(f"quantity {int(token)}")
+        elif lowered in _STATUSES:
+            condition &= Q(status=lowered)
+            filters.append(f"status {lowered}")
+        else:
+            words.append(token)
+
+    if words:
+        query = " ".join(words)
+        condition &= Q(medicine_id__in=search_medicine_ids(query, limit=None))
+        filters.append(f"medicine {query}")
+
+    return condition, filters
@@ -0,0 +1,21 @@
+# inventory/serializers.py
+
+from rest_framework import serializers
+
+
+class DispenseLineSerializer(serializers.Serializer):
+    medicine = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+    dosage = serializers.IntegerField(required=False, allow_null=True)
+    remarks = serializers.CharField(required=False, allow_blank=True, default="")
+
+
+class DispenseBasketSerializer(serializers.Serializer):
+    # idempotency key, unique on the TransactionBatch and stored on every Transaction of the basket
+    request_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    remarks = serializers.CharField(required=False, allow_blank=True, default="")
+    lines = DispenseLineSerializer(many=True, allow_empty=False)
+
+
+class DispenseRequestSerializer(serializers.Serializer):
+    baskets = DispenseBasketSerializer(many=True, allow_empty=False, max_length=500)
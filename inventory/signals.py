@@ -0,0 +1,62 @@
+# inventory/signals.py
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from inventory import events, notifications, search, stats
+from inventory.models import Inventory, Medicine, MedicineStockSummary, Notification, StockMovement, Transaction
+
+# bulk writes (dispenses, the notification sweep) publish events instead of signals
+events.subscribe(stats.invalidate)
+events.subscribe(notifications.invalidate_feed)
+
+
+@receiver([post_save, post_delete], sender=Inventory)
+@receiver([post_save, post_delete], sender=Transaction)
+def dashboard_data_changed(sender, **kwargs):
+    stats.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Notification)
+def notification_changed(sender, **kwargs):
+    notifications.invalidate_feed()
+
+
+@receiver(pre_save, sender=Inventory)
+def remember_quantity(sender, instance, **kwargs):
+    instance._previous_quantity = (
+        Inventory.objects.all_items().filter(pk=instance.pk).values_list("quantity", flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Inventory)
+def record_movement(sender, instance, created, **kwargs):
+    # dispenses write their own movements, this covers receiving and manual edits
+    previous = getattr(instance, "_previous_quantity", None) or 0
+    delta = instance.quantity - previous
+    if delta:
+        StockMovement.objects.create(
+            inventory=instance,
+            delta=delta,
+            reason="receive" if created else "adjust",
+        )
+
+
+@receiver([post_save, post_delete], sender=Inventory)
+def inventory_changed(sender, instance, origin=None, **kwargs):
+    # receiving / editing a batch: rebuild that medicine's summary in the same
+    # DB transaction. Skip when the whole medicine is being deleted.
+    if not isinstance(origin, Medicine):
+        MedicineStockSummary.rebuild([instance.medicine_id])
+    events.publish(events.INVENTORY)
+
+
+@receiver(post_save, sender=Medicine)
+def medicine_saved(sender, instance, **kwargs):
+    search.medicine_changed(instance)
+
+
+@receiver(post_delete, sender=Medicine)
+def medicine_deleted(sender, instance, **kwargs):
+    search.medicine_changed(instance, deleted=True)
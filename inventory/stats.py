@@ -0,0 +1,139 @@
+# inventory/stats.py
+
+import logging
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from inventory.cache_versions import bump_version, current_version
+from inventory.models import NEAR_EXPIRY_DAYS, Classification, Inventory, Medicine, Notification, Transaction
+
+logger = logging.getLogger(__name__)
+
+LOW_STOCK_THRESHOLD = 10
+
+CACHE_TTL = 300  # seconds, safety net on top of the signal-driven invalidation
+VERSION_KEY = "dashboard:stats:version"
+RECOMPUTE_TIMEOUT = 10  # seconds a waiter trusts another process to finish the recompute
+
+
+# Panel filters, shared by the panel querysets and the counters below so the
+# lists and their totals cannot drift apart
+
+def _near_expiry_horizon():
+    return timezone.now().date() + timedelta(days=NEAR_EXPIRY_DAYS)
+
+
+def _low_stock_q():
+    return Q(quantity__lte=LOW_STOCK_THRESHOLD)
+
+
+def _near_expiry_q():
+    return Q(expiration_date__lte=_near_expiry_horizon())
+
+
+# Dashboard panels, shared by the full page and its HTMX partials
+
+def low_stock_queryset():
+    return Inventory.objects.filter(_low_stock_q()).select_related("medicine").order_by("quantity")
+
+
+def near_expiry_queryset():
+    return Inventory.objects.filter(_near_expiry_q()).select_related("medicine").order_by("expiration_date")
+
+
+def expired_queryset():
+    return Inventory.objects.expired().select_related("medicine").order_by("expiration_date")
+
+
+def recent_transactions_queryset():
+    return Transaction.objects.select_related("medicine").order_by("-transaction_date")
+
+
+def inventory_counters():
+    """Stock totals and panel counts in one pass over the inventory table."""
+    sellable = Q(expiration_date__gte=timezone.now().date())
+    counters = Inventory.objects.all_items().aggregate(
+        total_stock=Sum("quantity", filter=sellable),
+        low_stock_count=Count("pk", filter=sellable & _low_stock_q()),
+        near_expiry_count=Count("pk", filter=sellable & _near_expiry_q()),
+        expired_count=Count("pk", filter=~sellable),
+    )
+    counters["total_stock"] = counters["total_stock"] or 0
+    return counters
+
+
+def notification_counters():
+    """Unread and not-yet-seen (bell badge) notification totals in one query, see notification_feed()."""
+    return Notification.objects.aggregate(
+        unread_notifications=Count("pk", filter=Q(is_read=False)),
+        notification_count=Count("pk", filter=Q(counted=True)),
+    )
+
+
+def compute_snapshot():
+    """All dashboard KPIs, straight from the database."""
+    return {
+        "total_medicines": Medicine.objects.count(),
+        **inventory_counters(),
+        "transaction_count": Transaction.objects.count(),
+        "pending_classifications": Classification.objects.filter(approved=False).count(),
+    }
+
+
+def dashboard_snapshot():
+    """
+    Cached dashboard KPIs. The key carries a version that every relevant
+    write bumps, and the date (expiry counts move at midnight). On a miss
+    only one caller recomputes, the others wait for its result. Without a
+    cache every caller computes its own.
+    """
+    try:
+        version = current_version(VERSION_KEY)
+        key = f"dashboard:stats:{version}:{timezone.now().date()}"
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            return snapshot
+        lock = f"{key}:lock"
+        recompute = cache.add(lock, 1, RECOMPUTE_TIMEOUT)
+    except Exception as e:
+        logger.warning("Dashboard stats cache unavailable: %s", e)
+        return compute_snapshot()
+
+    if recompute:
+        try:
+            snapshot = compute_snapshot()
+            try:
+                cache.set(key, snapshot, CACHE_TTL)
+            except Exception as e:
+                logger.warning("Dashboard stats not cached: %s", e)
+        finally:
+            try:
+                cache.delete(lock)
+            except Exception:
+                pass  # it times out on its own
+        return snapshot
+
+    deadline = time.monotonic() + RECOMPUTE_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        try:
+            snapshot = cache.get(key)
+        except Exception:
+            break
+        if snapshot is not None:
+            return snapshot
+    return compute_snapshot()  # the recomputing process died, do it ourselves
+
+
+def _bump_version():
+    bump_version(VERSION_KEY)
+
+
+def invalidate(*args, **kwargs):
+    """Drop the cached snapshot once the current DB transaction commits."""
+    transaction.on_commit(_bump_version, robust=True)  # a cache outage must not fail the committed write
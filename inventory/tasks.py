@@ -0,0 +1,24 @@
+from celery import shared_task
+from .ledger import take_snapshots
+from .models import MedicineStockSummary, StockReservation
+from .notifications import sync_notifications
+
+@shared_task
+def refresh_notifications():
+    return sync_notifications()
+
+
+@shared_task
+def rollover_stock_summaries():
+    """Batches cross into near-expiry / expired by date alone, so rebuild daily."""
+    MedicineStockSummary.rebuild()
+
+
+@shared_task
+def snapshot_stock():
+    return take_snapshots()
+
+
+@shared_task
+def expire_reservations():
+    return StockReservation.expire()
@@ -1,3 +1,225 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from inventory import cache_versions, notifications, search, stats
+from inventory.cart import Cart
+from inventory.models import (
+    Inventory, Medicine, MedicineStockSummary, StockReservation, Transaction, TransactionBatch,
+)
+from inventory.search import boolean_query
+from inventory.views.api import DispenseAPIView
+
+
+class DispenseAPIIdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("pos", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.medicine = Medicine.objects.create(generic_name="Paracetamol", dosage_form="Tablet", strength="500mg")
+        Inventory.objects.create(
+            medicine=self.medicine,
+            batch_number="B1",
+            quantity=10,
+            expiration_date=timezone.now().date() + timedelta(days=365),
+        )
+
+    def basket(self, request_id):
+        return {"request_id": request_id, "remarks": "", "lines": [{"medicine": self.medicine.pk, "quantity": 3}]}
+
+    def dispense(self, *baskets):
+        response = self.client.post(reverse("api-dispense"), {"baskets": list(baskets)}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def stock(self):
+        return sum(Inventory.objects.filter(medicine=self.medicine).values_list("quantity", flat=True))
+
+    def test_same_key_twice_dispenses_once(self):
+        [first] = self.dispense(self.basket("REQ-1"))
+        [second] = self.dispense(self.basket("REQ-1"))
+
+        self.assertEqual(first["status"], "dispensed")
+        self.assertEqual(second["status"], "duplicate")
+        self.assertEqual(second["batch_id"], first["batch_id"])
+        self.assertEqual(self.stock(), 7)
+        self.assertEqual(Transaction.objects.filter(request_id="REQ-1").count(), 1)
+
+    def test_same_key_twice_in_one_request(self):
+        first, second = self.dispense(self.basket("REQ-2"), self.basket("REQ-2"))
+
+        self.assertEqual([first["status"], second["status"]], ["dispensed", "duplicate"])
+        self.assertEqual(second["batch_id"], first["batch_id"])
+        self.assertEqual(self.stock(), 7)
+
+    def test_retry_that_missed_the_lookup_is_stopped_by_the_key(self):
+        # a concurrent retry committed between this request's lookup and its insert
+        winner = TransactionBatch.objects.create(batch_id=TransactionBatch.generate_batch_id(), request_id="REQ-3")
+        basket = self.basket("REQ-3")
+
+        result = DispenseAPIView().dispense_basket(
+            self.user, basket, {self.medicine.pk: self.medicine}, {}, dispensed={},
+        )
+
+        self.assertEqual(result["status"], "duplicate")
+        self.assertEqual(result["batch_id"], winner.batch_id)
+        self.assertEqual(self.stock(), 10)
+
+    def test_baskets_without_a_key_are_not_deduplicated(self):
+        first, second = self.dispense(self.basket(""), self.basket(""))
+
+        self.assertEqual([first["status"], second["status"]], ["dispensed", "dispensed"])
+        self.assertEqual(self.stock(), 4)
+
+
+class StockSummaryTests(TestCase):
+    def setUp(self):
+        # the feature flags of MySQL, the production backend
+        for flag in ("supports_update_conflicts_with_target", "can_return_rows_from_bulk_insert"):
+            patcher = mock.patch.object(type(connection.features), flag, False)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.medicine = Medicine.objects.create(generic_name="Cetirizine", dosage_form="Tablet", strength="10mg")
+        self.today = timezone.now().date()
+
+    def add_batch(self, number, quantity, days):
+        return Inventory.objects.create(
+            medicine=self.medicine, batch_number=number, quantity=quantity,
+            expiration_date=self.today + timedelta(days=days),
+        )
+
+    def summary(self):
+        return MedicineStockSummary.objects.get(pk=self.medicine.pk)
+
+    def test_inventory_saves_keep_the_summary(self):
+        self.add_batch("B1", 10, 365)
+        self.add_batch("B2", 4, -1)
+
+        summary = self.summary()
+        self.assertEqual((summary.sellable, summary.expired, summary.batch_count), (10, 4, 1))
+
+    def test_dispense_updates_the_summary(self):
+        self.add_batch("B1", 10, 365)
+        batch = TransactionBatch.objects.create(batch_id=TransactionBatch.generate_batch_id())
+
+        batch.dispense([Transaction(medicine=self.medicine, quantity_dispensed=3)])
+
+        self.assertEqual(self.summary().sellable, 7)
+
+    def test_dispense_creates_a_missing_summary(self):
+        self.add_batch("B1", 10, 365)
+        MedicineStockSummary.objects.all().delete()
+        batch = TransactionBatch.objects.create(batch_id=TransactionBatch.generate_batch_id())
+
+        batch.dispense([Transaction(medicine=self.medicine, quantity_dispensed=3)])
+
+        self.assertEqual(self.summary().sellable, 7)
+
+
+class ReservedStockTests(TestCase):
+    def setUp(self):
+        self.holder = User.objects.create_user("holder")
+        self.seller = User.objects.create_user("seller")
+        self.medicine = Medicine.objects.create(generic_name="Losartan", dosage_form="Tablet", strength="50mg")
+        Inventory.objects.create(
+            medicine=self.medicine, batch_number="B1", quantity=10,
+            expiration_date=timezone.now().date() + timedelta(days=365),
+        )
+        Cart(self.holder).add(self.medicine.pk, 6)
+
+    def dispense(self, user, quantity):
+        batch = TransactionBatch.objects.create(user=user, batch_id=TransactionBatch.generate_batch_id())
+        return batch.dispense([Transaction(user=user, medicine=self.medicine, quantity_dispensed=quantity)])
+
+    def test_stock_held_by_another_cart_is_not_dispensed(self):
+        with self.assertRaisesMessage(ValueError, "Available: 4"):
+            self.dispense(self.seller, 5)
+
+        self.dispense(self.seller, 4)
+        Cart(self.holder).checkout()
+        self.assertEqual(MedicineStockSummary.sellable_for(self.medicine.pk), 0)
+
+    def test_single_transaction_respects_reservations(self):
+        tx = Transaction.objects.create(user=self.seller, medicine=self.medicine, quantity_dispensed=5)
+        tx.status = "dispensed"
+
+        with self.assertRaises(ValueError):
+            tx.dispense()
+
+    def test_another_user_cannot_remove_a_cart_line(self):
+        [line] = Cart(self.holder).list()
+
+        self.assertEqual(Cart(self.seller).remove(line.id), 0)
+        self.assertTrue(StockReservation.objects.filter(pk=line.id).exists())
+
+        self.assertEqual(Cart(self.holder).remove(line.id), 1)
+        self.assertFalse(StockReservation.objects.filter(pk=line.id).exists())
+
+    def test_own_reservation_is_released_by_the_dispense(self):
+        self.dispense(self.holder, 8)
+
+        self.assertFalse(StockReservation.objects.filter(user=self.holder).exists())
+        self.assertEqual(MedicineStockSummary.sellable_for(self.medicine.pk), 2)
+
+
+class FulltextQueryTests(SimpleTestCase):
+    def test_every_word_is_required(self):
+        self.assertEqual(boolean_query("Amoxicillin 500"), "+amoxicillin +500")
+
+    def test_boolean_operators_are_dropped(self):
+        self.assertEqual(boolean_query('-para* "cetamol" ~(x)'), "+para +cetamol +x")
+        self.assertEqual(boolean_query("+-*"), "")
+
+
+class FailingCache:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis down")
+        return fail
+
+
+class CacheOutageTests(TestCase):
+    def setUp(self):
+        for module in (cache_versions, notifications, search, stats):
+            patcher = mock.patch.object(module, "cache", FailingCache())
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_dashboard_is_computed_from_the_database(self):
+        Medicine.objects.create(generic_name="Omeprazole", dosage_form="Capsule", strength="20mg")
+
+        self.assertEqual(stats.dashboard_snapshot()["total_medicines"], 1)
+
+    def test_hot_medicines_are_read_from_the_database(self):
+        medicine = Medicine.objects.create(generic_name="Metformin", dosage_form="Tablet", strength="500mg")
+
+        self.assertEqual(search.hot_medicine_ids(), [medicine.pk])
+
+    def test_notification_feed_is_read_from_the_database(self):
+        self.assertEqual(notifications.notification_feed()["latest"], [])
+
+
+class DashboardTests(TestCase):
+    def test_panels_show_their_totals(self):
+        self.client.force_login(User.objects.create_user("owner"))
+        medicine = Medicine.objects.create(generic_name="Salbutamol", dosage_form="Inhaler", strength="100mcg")
+        today = timezone.now().date()
+        for number, quantity, days in [("L1", 3, 365), ("L2", 5, 365), ("E1", 20, -3)]:
+            Inventory.objects.create(
+                medicine=medicine, batch_number=number, quantity=quantity,
+                expiration_date=today + timedelta(days=days),
+            )
+
+        response = self.client.get(reverse("dashboard"))
+
+        self.assertEqual(
+            [response.context[name] for name in ("low_stock_count", "near_expiry_count", "expired_count")],
+            [2, 0, 1],
+        )
+        self.assertContains(response, ">2</span>")
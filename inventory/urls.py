@@ -8,8 +8,8 @@ from inventory.views.dashboard import (
     recent_transactions_pagination,
     expired_pagination,
 )    
-from inventory.views.classification import MedicineClassificationView
-from inventory.views.medicine import MedicineDetailView, MedicineListView
+from inventory.views.classification import MedicineClassificationStreamView, MedicineClassificationView
+from inventory.views.medicine import MedicineAutocompleteView, MedicineDetailView, MedicineListView
 from inventory.views.inventory import InventoryListView, InventoryDetailView
 from inventory.views.transaction import (
     TransactionListView, 
@@ -21,6 +21,8 @@ from inventory.views.transaction import (
     TransactionSuccessMultipleView, 
     TransactionItemsListView
 )
+from inventory.views.api import DispenseAPIView
+from inventory.views.search import SearchView
 from django.contrib.auth import views as auth_views
 from inventory.views.dashboard import notification_view, mark_notifications_as_bell_is_clicked, mark_notifications_as_viewed
 
@@ -28,6 +30,7 @@ urlpatterns = [
     path('', DashboardView.as_view(), name='dashboard'),
     path("medicines/", MedicineListView.as_view(), name="medicines-list"),
     path("medicines/<int:pk>/", MedicineDetailView.as_view(), name="medicine-detail"),
+    path("medicines/autocomplete/", MedicineAutocompleteView.as_view(), name="medicine-autocomplete"),
     path("inventory/", InventoryListView.as_view(), name="inventory-list"),
     path("inventory/<int:pk>/", InventoryDetailView.as_view(), name="inventory-detail"),
     path("transaction/", TransactionListView.as_view(), name="transaction-list"),
@@ -38,7 +41,9 @@ urlpatterns = [
     path("transaction/success/single/<int:pk>/", TransactionSuccessView.as_view(), name='transaction-success'),
     path("transaction/success/multiple/<str:pk>/", TransactionSuccessMultipleView.as_view(), name='transaction-success-multiple'),
     path('transactions/list/', TransactionItemsListView.as_view(), name='transaction-list-forms'),
+    path("search/", SearchView.as_view(), name="inventory-search-view"),
     path('classify/', MedicineClassificationView.as_view(), name='classify'),  # Placeholder for classification view
+    path('classify/stream/', MedicineClassificationStreamView.as_view(), name='classify-stream'),
 
 
     # HTMX
@@ -52,6 +57,10 @@ urlpatterns = [
     
 
 
+    # JSON API
+    path("api/dispense/", DispenseAPIView.as_view(), name="api-dispense"),
+
+
     # authentication
     path("login/", auth_views.LoginView.as_view(template_name="inventory/login.html"), name="login"),
     path("logout/", auth_views.LogoutView.as_view(next_page="login"), name="logout"),
@@ -0,0 +1,106 @@
+# inventory/views/api.py
+
+from django.db import IntegrityError, transaction as db_transaction
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from inventory.models import DosageInstruction, Medicine, Transaction, TransactionBatch
+from inventory.serializers import DispenseRequestSerializer
+
+
+class DispenseAPIView(APIView):
+    """
+    Dispense many baskets in one request for POS / ward integrations.
+
+    POST {"baskets": [{"request_id": "...", "lines": [{"medicine": 1, "quantity": 2}]}]}
+
+    Every basket is dispensed on its own (one TransactionBatch each), so a
+    failing basket does not roll back the others. Re-sending a basket with
+    a ``request_id`` that was already dispensed returns the original batch
+    instead of dispensing twice. The key is unique on TransactionBatch, so
+    this holds for retries that arrive at the same time too.
+    """
+
+    def post(self, request):
+        serializer = DispenseRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        baskets = serializer.validated_data["baskets"]
+
+        # everything the baskets reference, loaded once for the whole request
+        lines = [line for basket in baskets for line in basket["lines"]]
+        medicines = Medicine.objects.in_bulk({line["medicine"] for line in lines})
+        dosages = DosageInstruction.objects.in_bulk({line["dosage"] for line in lines if line.get("dosage")})
+        request_ids = {basket["request_id"] for basket in baskets if basket.get("request_id")}
+        dispensed = dict(
+            TransactionBatch.objects.filter(request_id__in=request_ids).values_list("request_id", "batch_id")
+        )
+
+        results = [self.dispense_basket(request.user, basket, medicines, dosages, dispensed) for basket in baskets]
+        return Response({"results": results})
+
+    def dispense_basket(self, user, basket, medicines, dosages, dispensed):
+        request_id = basket.get("request_id") or None
+        result = {"request_id": request_id}
+
+        if request_id in dispensed:
+            result.update(status="duplicate", batch_id=dispensed[request_id])
+            return result
+
+        errors = []
+        for number, line in enumerate(basket["lines"], start=1):
+            if line["medicine"] not in medicines:
+                errors.append(f"Line {number}: Medicine with ID {line['medicine']} does not exist")
+            if line.get("dosage") and line["dosage"] not in dosages:
+                errors.append(f"Line {number}: Dosage with ID {line['dosage']} does not exist")
+        if errors:
+            result.update(status="error", errors=errors)
+            return result
+
+        try:
+            with db_transaction.atomic():
+                # claims the key first: a concurrent retry blocks here, then fails
+                tb = TransactionBatch.objects.create(
+                    user=user,
+                    batch_id=TransactionBatch.generate_batch_id(),
+                    remarks=basket["remarks"],
+                    request_id=request_id,
+                )
+                created = tb.dispense([
+                    Transaction(
+                        user=user,
+                        medicine=medicines[line["medicine"]],
+                        dosage=dosages.get(line.get("dosage")),
+                        quantity_dispensed=line["quantity"],
+                        remarks=line["remarks"],
+                        request_id=request_id,
+                    )
+                    for line in basket["lines"]
+                ])
+        except ValueError as e:
+            result.update(status="error", errors=[str(e)])
+            return result
+        except IntegrityError:
+            winner = TransactionBatch.objects.filter(request_id=request_id).values_list("batch_id", flat=True).first()
+            if request_id is None or winner is None:
+                raise
+            dispensed[request_id] = winner
+            result.update(status="duplicate", batch_id=winner)
+            return result
+
+        if request_id:
+            dispensed[request_id] = tb.batch_id  # same key twice in one request
+        result.update(
+            status="dispensed",
+            batch_id=tb.batch_id,
+            transactions=[
+                {
+                    "id": tx.pk,
+                    "medicine": tx.medicine_id,
+                    "quantity": tx.quantity_dispensed,
+                    "stock_before": tx.stock_before,
+                    "stock_after": tx.stock_after,
+                }
+                for tx in created
+            ],
+        )
+        return result
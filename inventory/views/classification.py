@@ -1,109 +1,148 @@
 from django.shortcuts import render
+from django.http import JsonResponse, StreamingHttpResponse
 
 # Create your views here.
 from django.views import View
 from django.urls import reverse_lazy
+from django.contrib.auth.views import redirect_to_login
 from inventory.forms import MedicineClassificationForm
-from django.contrib.auth.mixins import LoginRequiredMixin
-from inventory.models import Notification, ChatSession, ChatMessage
-from django.db.models import Q, Sum
+from inventory.models import ChatSession, ChatMessage
+from asgiref.sync import sync_to_async
 from datetime import datetime
-from openai import OpenAI
+from chat import answer_cache, llm
+import json
 import markdown
-<<<<<<< HEAD
-from config.settings import HF_API_KEY
-=======
-from django.conf import settings
->>>>>>> 5750e87 (Update the hf api keys)
 
 
-class MedicineClassificationView(LoginRequiredMixin, View):
+class MedicineClassificationView(View):
+    """
+    Async so a slow completion only parks a coroutine, not a worker thread.
+    Rendering (context processors, lazy querysets) stays sync and runs in
+    the thread pool.
+    """
     template_name = 'inventory/classify.html'
     login_url = 'login'
     CONFIDENCE_THRESHOLD = 10  # percent
 
-    def generate_ai_reply(self, input_text):
-        client = OpenAI(
-            base_url="https://router.huggingface.co/v1",
-            api_key=settings.HF_API_KEY
-        )
-
-        completion = client.chat.completions.create(
-            model="meta-llama/Llama-3.1-8B-Instruct:cerebras",
-            messages=[
-                {
-                    "role": "user",
-                    "content": input_text,
-                }
-            ],
-        )
+    async def dispatch(self, request, *args, **kwargs):
+        # LoginRequiredMixin reads request.user, which is sync only
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), reverse_lazy(self.login_url))
+        return await super().dispatch(request, *args, **kwargs)
 
-     
-        return completion.choices[0].message.content
+    async def generate_ai_reply(self, input_text):
+        found = await answer_cache.lookup(input_text)
+        if found.answer is not None:
+            return found.answer
+        ai_response = await llm.complete([
+            {
+                "role": "user",
+                "content": input_text,
+            }
+        ])
+        await answer_cache.store(input_text, ai_response, found)
+        return ai_response
 
-    def get(self, request):
+    async def get(self, request):
         """Render the blank classification form."""
         form = MedicineClassificationForm()
-        session, _ = ChatSession.objects.get_or_create(user=request.user)
+        session, _ = await ChatSession.objects.aget_or_create(user=await request.auser())
         messages = session.messages.order_by("-created_at")
         context = {
             'form': form,
             'now': datetime.now(),
             "ai_messages": messages,
-            "show_typing": False, 
-            "notifications": Notification.objects.filter(is_read=False).order_by('-created_at'),
-            "notification_count": Notification.objects.filter(counted=True).count(),
+            "show_typing": False,
         }
-        return render(request, self.template_name, context)
-    
-    def post(self, request):
+        return await sync_to_async(render)(request, self.template_name, context)
+
+    async def post(self, request):
         """Process the classification form submission."""
         form = MedicineClassificationForm(request.POST)
         ai_response = None
         user_question = None
+        session, _ = await ChatSession.objects.aget_or_create(user=await request.auser())
 
         if form.is_valid():
             input_text = form.cleaned_data['input_text']
             # Call the AI service to get a response
-            
-            
-            session, _ = ChatSession.objects.get_or_create(user=request.user)
-            
-            
-            ai_response = self.generate_ai_reply(input_text)
-            # Save user question
-            ChatMessage.objects.create(
-                session=session,
-                sender="user",
-                content=input_text
-            )
-            # Save AI reply
-            ChatMessage.objects.create(
-                session=session,
-                sender="ai",
-                content=ai_response
-            )
-            
-            
-            
-        ai_response = markdown.markdown(ai_response)
+            try:
+                ai_response = await self.generate_ai_reply(input_text)
+            except llm.LLMError as e:
+                form.add_error('input_text', str(e))
+            else:
+                # Save user question
+                await ChatMessage.objects.acreate(
+                    session=session,
+                    sender="user",
+                    content=input_text
+                )
+                # Save AI reply
+                await ChatMessage.objects.acreate(
+                    session=session,
+                    sender="ai",
+                    content=ai_response
+                )
+                form = MedicineClassificationForm()
+
+        ai_response = markdown.markdown(ai_response) if ai_response else None
         messages = session.messages.order_by("-created_at")
-        form = MedicineClassificationForm()
         context = {
             'form': form,
             "ai_messages": messages,
             'ai_response': ai_response,
             "user_question": user_question,
-            "show_typing": True,
+            "show_typing": ai_response is not None,
             'now': datetime.now(),
-            "notifications": Notification.objects.filter(is_read=False).order_by('-created_at'),
-            "notification_count": Notification.objects.filter(counted=True).count(),
         }
-        return render(request, self.template_name, context)
-    
+        return await sync_to_async(render)(request, self.template_name, context)
 
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    
 
+class MedicineClassificationStreamView(MedicineClassificationView):
+    """
+    POST a question, get the answer back as server-sent events while it is
+    generated: "token" events with each piece of text, then "done" with the
+    rendered answer, or "error". The chat history is saved once the answer
+    is complete.
+    """
+    http_method_names = ["post"]
+
+    async def post(self, request):
+        form = MedicineClassificationForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+
+        session, _ = await ChatSession.objects.aget_or_create(user=await request.auser())
+        response = StreamingHttpResponse(
+            self.events(session, form.cleaned_data['input_text']),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx: pass chunks straight through
+        return response
+
+    async def events(self, session, input_text):
+        found = await answer_cache.lookup(input_text)
+        if found.answer is not None:
+            ai_response = found.answer
+            yield _sse("token", {"text": ai_response})
+        else:
+            parts = []
+            try:
+                async for text in llm.stream([{"role": "user", "content": input_text}]):
+                    parts.append(text)
+                    yield _sse("token", {"text": text})
+            except llm.LLMError as e:
+                yield _sse("error", {"message": str(e)})
+                return
+            ai_response = "".join(parts)
+            await answer_cache.store(input_text, ai_response, found)
 
+        await ChatMessage.objects.acreate(session=session, sender="user", content=input_text)
+        await ChatMessage.objects.acreate(session=session, sender="ai", content=ai_response)
+        yield _sse("done", {"html": markdown.markdown(ai_response)})
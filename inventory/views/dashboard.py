@@ -1,154 +1,112 @@
 # inventory/views/dashboard.py
 
 from django.views import View
-from django.utils import timezone
-from django.db.models import Count
-from inventory.models import Medicine, Inventory, Classification, Transaction, Notification
+from inventory.models import Notification
 from django.contrib.auth.mixins import LoginRequiredMixin
 from datetime import datetime
-from django.core.paginator import Paginator
 from django.shortcuts import render
 from urllib.parse import urlencode, urlparse, parse_qs
-import time
 from django.http import HttpResponse
 from django.urls import reverse
+from inventory import events, stats
+from inventory.pagination import KeysetPaginator
+
+PANEL_SIZE = 5
 
 class DashboardView(LoginRequiredMixin, View):
     template_name = "inventory/dashboard.html"
     login_url = 'login'
 
     def get(self, request):
-        
-        total_medicines = Medicine.objects.count()
-        total_stock = Inventory.objects.aggregate(total=Count('quantity'))['total']
-      
-        # Querysets
-        low_stock_qs = Inventory.objects.filter(quantity__lte=10).order_by('quantity')
-        near_expiry_qs = Inventory.objects.filter(expiration_date__lte=timezone.now().date() + timezone.timedelta(days=30)).order_by('expiration_date')
-        transactions_qs = Transaction.objects.order_by('-transaction_date')
-        expired_qs = Inventory.objects.expired()
+        snapshot = stats.dashboard_snapshot()
 
-        # Pagination setup
-        low_stock_paginator = Paginator(low_stock_qs, 5)
-        near_expiry_paginator = Paginator(near_expiry_qs, 5)
-        tx_paginator = Paginator(transactions_qs, 5)
-        expired_paginator = Paginator(expired_qs, 5)
+        # Pagination setup, panels seek by cursor so no COUNT(*) per page
+        low_stock_paginator = KeysetPaginator(stats.low_stock_queryset(), PANEL_SIZE)
+        near_expiry_paginator = KeysetPaginator(stats.near_expiry_queryset(), PANEL_SIZE)
+        tx_paginator = KeysetPaginator(stats.recent_transactions_queryset(), PANEL_SIZE)
+        expired_paginator = KeysetPaginator(stats.expired_queryset(), PANEL_SIZE)
         
 
         context = {
-            'total_medicines': total_medicines,
-            'total_stock': total_stock,
-            'low_stock': low_stock_paginator.get_page(self.request.GET.get('low_page', 1)),  # Show only first 5 items
+            'total_medicines': snapshot['total_medicines'],
+            'total_stock': snapshot['total_stock'],
+            'low_stock_count': snapshot['low_stock_count'],
+            'near_expiry_count': snapshot['near_expiry_count'],
+            'expired_count': snapshot['expired_count'],
+            'low_stock': low_stock_paginator.get_page(self.request.GET.get('low_cursor')),  # Show only first 5 items
             'low_stock_paginator': low_stock_paginator,
-            'near_expiry': near_expiry_paginator.get_page(self.request.GET.get('exp_page', 1)),  # Show only first 5 items\
+            'near_expiry': near_expiry_paginator.get_page(self.request.GET.get('exp_cursor')),  # Show only first 5 items
             'near_expiry_paginator': near_expiry_paginator,
-            'recent_transactions': tx_paginator.get_page(self.request.GET.get('tx_page', 1)),  # Show only first 5 items
+            'recent_transactions': tx_paginator.get_page(self.request.GET.get('tx_cursor')),  # Show only first 5 items
             'tx_paginator': tx_paginator,
-            'expired': expired_paginator.get_page(self.request.GET.get('ex_page', 1)),
+            'expired': expired_paginator.get_page(self.request.GET.get('ex_cursor')),
             'expired_paginator': expired_paginator,
-            'pending_classifications': Classification.objects.filter(approved=False),
+            'pending_classifications': snapshot['pending_classifications'],
             'now': datetime.now(),
-            "notifications": Notification.objects.filter(is_read=False).order_by('-created_at'),
-            "notification_count": Notification.objects.filter(counted=True).count(),
         }
 
         return render(request, self.template_name, context)
     
 def low_stock_pagination(request):
-    low_stock_qs = Inventory.objects.filter(quantity__lte=10).order_by('quantity')
-    low_stock_paginator = Paginator(low_stock_qs, 5)
-    low_stock_page = low_stock_paginator.get_page(request.GET.get('low_page', 1))
+    low_stock_paginator = KeysetPaginator(stats.low_stock_queryset(), PANEL_SIZE)
+    low_stock_page = low_stock_paginator.get_page(request.GET.get('low_cursor'))
 
     context = {
+        'low_stock_count': stats.dashboard_snapshot()['low_stock_count'],
         'low_stock': low_stock_page,
         'low_stock_paginator': low_stock_paginator,
     }
-    time.sleep(1)
     return render(request, 'inventory/partials/dashboard/low_stock_partials.html', context)
 
 def near_expiry_pagination(request):
-
-    near_expiry_qs = Inventory.objects.filter(expiration_date__lte=timezone.now().date() + timezone.timedelta(days=30)).order_by('expiration_date')
-    near_expiry_paginator = Paginator(near_expiry_qs, 5)
-    near_expiry_page = near_expiry_paginator.get_page(request.GET.get('exp_page', 1))
+    near_expiry_paginator = KeysetPaginator(stats.near_expiry_queryset(), PANEL_SIZE)
+    near_expiry_page = near_expiry_paginator.get_page(request.GET.get('exp_cursor'))
    
     context = {
+        'near_expiry_count': stats.dashboard_snapshot()['near_expiry_count'],
         'near_expiry': near_expiry_page,
         'near_expiry_paginator': near_expiry_paginator,
         
     }
-    time.sleep(1)
  
     return render(request, 'inventory/partials/dashboard/near_expiry_partials.html', context)
 
 def expired_pagination(request):
-
-    expired_qs = Inventory.objects.expired().order_by('expiration_date')
-    expired_paginator = Paginator(expired_qs, 5)
-    expired_page = expired_paginator.get_page(request.GET.get('exp_page', 1))
+    expired_paginator = KeysetPaginator(stats.expired_queryset(), PANEL_SIZE)
+    expired_page = expired_paginator.get_page(request.GET.get('ex_cursor'))
    
     context = {
+        'expired_count': stats.dashboard_snapshot()['expired_count'],
         'expired': expired_page,
         'expired_paginator': expired_paginator,
     }
-    time.sleep(1)
  
     return render(request, 'inventory/partials/dashboard/expired_partials.html', context)
 
 def recent_transactions_pagination(request):
-   
-    transactions_qs = Transaction.objects.order_by('-transaction_date')
-    tx_paginator = Paginator(transactions_qs, 5)
-    tx_page = tx_paginator.get_page(request.GET.get('tx_page', 1))
+    tx_paginator = KeysetPaginator(stats.recent_transactions_queryset(), PANEL_SIZE)
+    tx_page = tx_paginator.get_page(request.GET.get('tx_cursor'))
     context = {
         'recent_transactions': tx_page,
         'tx_paginator': tx_paginator,
     }
-    time.sleep(1)
     return render(request, 'inventory/partials/dashboard/recent_transaction_partials.html', context)
 
 def notification_view(request):
-    near_expiry_qs = Inventory.objects.filter(expiration_date__lte=timezone.now().date() + timezone.timedelta(days=30)).order_by('expiration_date')
-    expired_qs = Inventory.objects.expired()
-
-    for item in near_expiry_qs:
-        Notification.objects.get_or_create(
-            inventory=item,
-            type="near_expiry",
-            defaults={
-                "message": f"{item.medicine.generic_name} will expire on {item.expiration_date}",
-                "counted": True,
-                "is_read": False,
-            },
-        )
-
-    for item in expired_qs:
-        Notification.objects.get_or_create(
-            inventory=item,
-            type="expired",
-            defaults={
-                "message": f"{item.medicine.generic_name} has expired!",
-                "counted": True,
-                "is_read": False,
-            },
-        )
-    context = {
-        "notifications": Notification.objects.filter(is_read=False).order_by('-created_at'),
-        "notification_count": Notification.objects.filter(counted=True).count(),
-    }
-
-    return render(request, 'inventory/partials/dashboard/notifications_partials.html', context)
+    # notifications are generated by the inventory.tasks.refresh_notifications beat job
+    # notifications and notification_count come from the context processor
+    return render(request, 'inventory/partials/dashboard/notifications_partials.html')
 
 def mark_notifications_as_bell_is_clicked(request):
     Notification.objects.filter(counted=True).update(counted=False)
-    return render(request, 'inventory/partials/dashboard/notif_count_partials.html', {
-        "notification_count": Notification.objects.filter(counted=True).count(),
-    })
+    events.publish(events.NOTIFICATIONS)
+    return render(request, 'inventory/partials/dashboard/notif_count_partials.html')
 
 def mark_notifications_as_viewed(request, pk):
     notif = Notification.objects.get(pk=pk)
     notif.is_read = True
     notif.save()
+    events.publish(events.NOTIFICATIONS)
     # build the URL you want to redirect to
     redirect_url = reverse(
         "inventory-detail",
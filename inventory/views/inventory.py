@@ -3,12 +3,14 @@
 from django.db.models import F
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView
-from inventory.models import Inventory, Transaction, Notification
+from inventory.models import Inventory
 from datetime import datetime
 from django.db.models import Q
+from inventory.pagination import KeysetPaginationMixin
+from inventory.search import search_medicine_ids
 
 
-class InventoryListView(LoginRequiredMixin, ListView):
+class InventoryListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Inventory
     template_name = "inventory/inventory_list.html"
     context_object_name = "inventories"
@@ -24,8 +26,8 @@ class InventoryListView(LoginRequiredMixin, ListView):
         )
         if q:
             queryset = queryset.filter(
-                Q(medicine__generic_name__icontains=q) |
-                Q(batch_number__icontains=q)
+                Q(medicine_id__in=search_medicine_ids(q, limit=None)) |
+                Q(batch_number__istartswith=q)
             )
 
         return queryset
@@ -34,8 +36,6 @@ class InventoryListView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['now'] = datetime.now()
-        context["notifications"] = Notification.objects.filter(is_read=False).order_by('-created_at')
-        context["notification_count"] = Notification.objects.filter(counted=True).count()
         return context
     
 class InventoryDetailView(LoginRequiredMixin, DetailView):
@@ -51,14 +51,12 @@ class InventoryDetailView(LoginRequiredMixin, DetailView):
         context = super().get_context_data(**kwargs)
         batch = self.object
 
-        # Get transactions linked to this medicine (later can track by batch)
-        context["transactions"] = (
-            Transaction.objects.filter(medicine=batch.medicine)
-            .order_by("-transaction_date")[:20]
+        # Stock movements of this batch from the ledger
+        context["movements"] = (
+            batch.movements.select_related("transaction__user")
+            .order_by("-created_at")[:20]
         )
         context["now"] = datetime.now()
-        context["notifications"] = Notification.objects.filter(is_read=False).order_by('-created_at')
-        context["notification_count"] = Notification.objects.filter(counted=True).count()
         return context
 
 
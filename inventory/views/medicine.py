@@ -1,7 +1,11 @@
 # inventory/views.py
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
-from inventory.models import Medicine, Notification
-from django.db.models import Sum, Q
+from django.views import View
+from django.http import JsonResponse
+from inventory.models import Medicine
+from inventory.search import hot_medicine_ids, ranked, search_medicine_ids
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from django.contrib.auth.mixins import LoginRequiredMixin
 from datetime import datetime
 
@@ -17,23 +21,18 @@ class MedicineListView(LoginRequiredMixin, ListView):
 
         queryset = (
             Medicine.objects.all()
-            .annotate(total_stock=Sum("inventory__quantity")).order_by('generic_name')
+            .annotate(total_stock=Coalesce(F("stock_summary__sellable"), 0)).order_by('generic_name')
         )
 
         if q:
-            queryset = queryset.filter(
-                Q(generic_name__icontains=q) |
-                Q(brand_name__icontains=q) |
-                Q(manufacturer__icontains=q)
-            )
+            # best matches first instead of alphabetical
+            queryset = ranked(queryset, search_medicine_ids(q, limit=None))
 
         return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["now"] = datetime.now()
-        context["notifications"] = Notification.objects.filter(is_read=False).order_by('-created_at')
-        context["notification_count"] = Notification.objects.filter(counted=True).count()
 
         return context
 
@@ -46,6 +45,18 @@ class MedicineDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["now"] = datetime.now()
-        context["notifications"] = Notification.objects.filter(is_read=False).order_by('-created_at')
-        context["notification_count"] = Notification.objects.filter(counted=True).count()
         return context
+
+
+class MedicineAutocompleteView(LoginRequiredMixin, View):
+    """Options for the remote medicine selects: {"results": [{"value", "text"}]}."""
+    login_url = 'login'
+    limit = 20
+
+    def get(self, request):
+        q = request.GET.get("q", "").strip()
+        ids = search_medicine_ids(q, self.limit) if q else hot_medicine_ids()
+        medicines = ranked(Medicine.objects.only("generic_name", "brand_name", "intended_for"), ids)
+        return JsonResponse({
+            "results": [{"value": medicine.pk, "text": str(medicine)} for medicine in medicines],
+        })
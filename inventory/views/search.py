@@ -0,0 +1,39 @@
+# inventory/views/search.py
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.shortcuts import render
+from django.views import View
+from inventory.models import Inventory, Medicine, TransactionBatch
+from inventory.search import ranked, search_medicine_ids
+
+RESULTS_PER_SECTION = 20
+
+
+class SearchView(LoginRequiredMixin, View):
+    """One search box over medicines, inventory batches and transaction batches."""
+    template_name = "inventory/search_results.html"
+    login_url = "login"
+
+    def get(self, request):
+        q = request.GET.get("q", "").strip()
+        context = {"query": q, "medicines": [], "batches": [], "transaction_batches": []}
+
+        if q:
+            medicines = Medicine.objects.annotate(total_stock=Coalesce(F("stock_summary__sellable"), 0))
+            context["medicines"] = ranked(medicines, search_medicine_ids(q, RESULTS_PER_SECTION))
+            # batch numbers and TX ids are typed from a label, a prefix lookup uses their index
+            context["batches"] = (
+                Inventory.objects.all_items()
+                .filter(batch_number__istartswith=q)
+                .select_related("medicine")
+                .order_by("batch_number")[:RESULTS_PER_SECTION]
+            )
+            context["transaction_batches"] = (
+                TransactionBatch.objects.filter(batch_id__istartswith=q)
+                .select_related("user")
+                .order_by("-batch_id")[:RESULTS_PER_SECTION]
+            )
+
+        return render(request, self.template_name, context)
@@ -2,31 +2,29 @@
 
 from django.views.generic import ListView, CreateView, DetailView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
-from inventory.models import Transaction, TransactionBatch, DosageInstruction, Notification
+from inventory.models import Transaction, TransactionBatch, DosageInstruction
 from inventory.forms import TransactionForm
 from django.urls import reverse_lazy
-from django.db.models import Sum, Q
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
 from datetime import datetime
 from django.shortcuts import render
-from inventory.models import Medicine
-from inventory.forms import TransactionForm, TransactionFormSet
+from inventory.cart import Cart
+from inventory.pagination import KeysetPaginationMixin
+from inventory.search import parse_transaction_query
+from inventory.forms import TransactionForm, TransactionFormSet, TransactionRowsForm
 from django.forms import modelformset_factory
 from django.db import transaction as db_transaction
 from django.urls import reverse
-from django.contrib.auth import get_user_model
-import uuid
 
-User = get_user_model()
 
 
-
-class TransactionListView(LoginRequiredMixin, ListView):
+class TransactionListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Transaction
     template_name = "inventory/transactions_list.html"
     context_object_name = "transactions"
     paginate_by = 10
+    estimate_total = True  # "about N" from table statistics, no COUNT(*)
     login_url = "login"
 
     def get_queryset(self):
@@ -35,22 +33,18 @@ class TransactionListView(LoginRequiredMixin, ListView):
             Transaction.objects.select_related("medicine", "user", "classification")
             .order_by("-transaction_date")  # newest first
         )
+        self.search_filters = []
         if q:
-            queryset = queryset.filter(
-                Q(transaction_date__icontains=q) |
-                Q(medicine__generic_name__icontains=q) |
-                Q(quantity_dispensed__icontains=q) |
-                Q(user__username__icontains=q) |
-                Q(batch__batch_id__icontains=q),
-            )
+            # dates, TX ids, @users and numbers each map to an indexed lookup
+            condition, self.search_filters = parse_transaction_query(q)
+            queryset = queryset.filter(condition)
 
         return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["now"] = datetime.now()
-        context["notifications"] = Notification.objects.filter(is_read=False).order_by('-created_at')
-        context["notification_count"] = Notification.objects.filter(counted=True).count()
+        context["search_filters"] = self.search_filters
         return context
     
 class TransactionCreateView(LoginRequiredMixin, View):
@@ -62,46 +56,36 @@ class TransactionCreateView(LoginRequiredMixin, View):
     def get(self, request):
         form = TransactionForm(initial={"medicine": request.GET.get("medicine")})
         
-        transactions = request.session.get('transactions', [])
         context = {
             "form": form,
-            "total_count": len(transactions),
-            "notifications": Notification.objects.filter(is_read=False).order_by('-created_at'),
-            "notification_count": Notification.objects.filter(counted=True).count(),
+            "total_count": Cart(request.user).count(),
         }
         return render(request, self.template_name, context)
     
     
     def post(self, request):
-        transactions = request.session.get('transactions', [])
+        cart = Cart(request.user)
         form = TransactionForm(request.POST)
         if form.is_valid():
             obj = form.save(commit=False)
-            obj.user = request.user
-            transactions.append(
-                {
-                    "id": str(uuid.uuid4()),
-                    "user": obj.user.id,
-                    "medicine": obj.medicine.id,
-                    "quantity_dispensed": obj.quantity_dispensed,
+            try:
+                # reserves the stock now so checkout does not fail on a race later
+                cart.add(obj.medicine.id, obj.quantity_dispensed)
+            except ValueError as e:
+                form.add_error("quantity_dispensed", str(e))
+            else:
+                messages.success(request, "Added successfully")
+                form = TransactionForm()  # return a fresh empty form
+                context = {
+                    "form": form,
+                    "total_count": cart.count(),
                 }
-            )
-            messages.success(request, "Added successfully")
-            request.session["transactions"] = transactions
-            print(request.session["transactions"])
-            form = TransactionForm()  # return a fresh empty form
-            context = {
-                "form": form,
-                "total_count": len(transactions),
-                "notifications": Notification.objects.filter(is_read=False).order_by('-created_at'),
-                "notification_count": Notification.objects.filter(counted=True).count(),
-            }
-           
-            return render(request, self.template_name, context)
+
+                return render(request, self.template_name, context)
         
         context = {
             "form": form,
-            "total_count": len(transactions)
+            "total_count": cart.count()
         }
             
         return render(request, self.template_name, context)
@@ -122,8 +106,6 @@ class TransactionDetailView(LoginRequiredMixin, DetailView):
         transaction = self.get_object()
         context["transaction"] = transaction
         context["now"] = datetime.now()
-        context["notifications"] = Notification.objects.filter(is_read=False).order_by('-created_at')
-        context["notification_count"] = Notification.objects.filter(counted=True).count()
         return context
     
 class TransactionStatusUpdateView(LoginRequiredMixin, View):
@@ -158,81 +140,45 @@ class TransactionCreateMultipleView(LoginRequiredMixin, View):
     template_name = "inventory/transaction_form_multiple.html"
 
     def get(self, request):
-        medicines = Medicine.objects.all()
+        # medicine options are loaded remotely, see MedicineAutocompleteView
         dosage = DosageInstruction.objects.all()
-        return render(request, self.template_name, {'medicines': medicines, "dosage": dosage})
+        return render(request, self.template_name, {"dosage": dosage})
 
     def post(self, request):
-        medicines = Medicine.objects.all()
         dosage = DosageInstruction.objects.all()
         total_forms = int(request.POST.get('form-TOTAL_FORMS', 0))
         if not total_forms:
             return render(request, self.template_name, {
                 'errors': ['No forms added']
             })
-        errors = []
+
+        # Validate every row up front, in a constant number of queries
+        rows_form = TransactionRowsForm(request.POST)
+        errors = rows_form.errors
 
         try:
+            if not rows_form.is_valid():
+                raise ValueError("Validation failed")
+
             with db_transaction.atomic():
-                transactions_to_create = []
                 tb = TransactionBatch.objects.create(
                     user=request.user,
                     batch_id=TransactionBatch.generate_batch_id()
                 )
-                for i in range(total_forms):
-                    med_id = request.POST.get(f'form-{i}-medicine')
-                    qty = request.POST.get(f'form-{i}-quantity_dispensed')
-                    dos_id = request.POST.get(f'form-{i}-dosage')
-                    remarks = request.POST.get(f'form-{i}-remarks')
-
-                    if not med_id or not qty or not dos_id:
-                        errors.append(f"Row {i+1}: Medicine and quantity and dosage are required")
-                        continue
-
-                    try:
-                        med = Medicine.objects.get(id=med_id)
-                    except Medicine.DoesNotExist:
-                        errors.append(f"Row {i+1}: Medicine with ID {med_id} does not exist")
-                        continue
-                    
-                    try:
-                        dos = DosageInstruction.objects.get(id=dos_id)
-                    except DosageInstruction.DoesNotExist:
-                        errors.append(f"Row {i+1}: Medicine with ID {med_id} does not exist")
-                        continue
-
-                    qty = int(qty)
-                    total_stock = med.inventory.aggregate(total=Sum("quantity"))["total"] or 0
-                    if qty > total_stock:
-                        errors.append(f"Row {i+1}: Not enough stock for {med.generic_name}. Available: {total_stock}, requested: {qty}")
-                        continue
-
-                    transactions_to_create.append((med, qty, remarks))
-
-                if errors:
-                    # If there are any errors, rollback by not creating anything
-                    raise ValueError("Validation failed")
-
-                # If all rows are valid, save transactions
-                for med, qty, remarks in transactions_to_create:
-                    tx = Transaction.objects.create(
-                        batch=tb,
-                        user=request.user,
-                        dosage=dos,
-                        medicine=med,
-                        quantity_dispensed=qty,
-                        remarks=remarks,
-                        status='dispensed'
-                    )
-                    tx.dispense()
+                # dispense the whole basket at once
+                try:
+                    tb.dispense(rows_form.transactions(request.user))
+                except ValueError as e:
+                    errors.append(str(e))
+                    raise
 
         except ValueError:
             # Render template with errors, nothing is saved
             return render(request, self.template_name, {
-                'medicines': medicines,
                 'dosage': dosage,
                 'errors': errors,
-                'initial_form': total_forms
+                'initial_form': total_forms,
+                'posted_rows': rows_form.posted_rows(),  # refill the rows as they were
             })
 
         return redirect('transaction-success-multiple', pk=tb.pk)
@@ -243,8 +189,6 @@ class TransactionSuccessView(LoginRequiredMixin, View):
         transaction = Transaction.objects.get(pk=pk)
         context = {
             "transaction": transaction,
-            "notifications": Notification.objects.filter(is_read=False).order_by('-created_at'),
-            "notification_count": Notification.objects.filter(counted=True).count(),
         }
         return render(request, self.template_name, context)
     
@@ -255,8 +199,6 @@ class TransactionSuccessMultipleView(LoginRequiredMixin, View):
         transaction_items = Transaction.objects.filter(batch=batch)
         context = {
             "transaction_items": transaction_items,
-            "notifications": Notification.objects.filter(is_read=False).order_by('-created_at'),
-            "notification_count": Notification.objects.filter(counted=True).count(),
         }
         print(transaction_items)
         return render(request, self.template_name, context)
@@ -264,101 +206,42 @@ class TransactionSuccessMultipleView(LoginRequiredMixin, View):
 class TransactionItemsListView(LoginRequiredMixin, View):
     template_name = 'inventory/transaction_form_list.html'
     def get(self, request):
-        transaction_list = request.session.get("transactions", [])
-        update_transaction_list = []
-
-
-        for transaction in transaction_list:
-            user = User.objects.get(pk=transaction.get("user"))
-            medicine = Medicine.objects.get(pk=transaction.get("medicine"))
-            update_transaction_list.append(
-                {
-                    "id": transaction.get("id"),
-                    "user": user,
-                    "medicine": medicine,
-                    "quantity_dispensed": transaction.get("quantity_dispensed"),
-                }
-            )
+        lines = Cart(request.user).list()
         
         context = {
-            "transactions": update_transaction_list,
-            "total_count": len(transaction_list),
-            "notifications": Notification.objects.filter(is_read=False).order_by('-created_at'),
-            "notification_count": Notification.objects.filter(counted=True).count(),
+            "transactions": lines,
+            "total_count": len(lines),
             
         }
         
         return render(request, self.template_name, context)
     
     def post(self, request):
-        transaction_list = request.session.get("transactions", [])
+        cart = Cart(request.user)
         clear_order = request.POST.get("clear-order", "")
         complete_order = request.POST.get("complete-order", "")
         remove_id = request.POST.get("remove_id", "")
-        context = {
-                "transactions": transaction_list,
-                "total_count": len(transaction_list),
-                "notifications": Notification.objects.filter(is_read=False).order_by('-created_at'),
-                "notification_count": Notification.objects.filter(counted=True).count(),
-        }
 
-        
         if clear_order == "clear-order":
-            request.session["transactions"] = []
+            cart.clear()
             messages.success(request, 'Clear orders successfully')
 
             return redirect('transaction-list-forms')
         
         if complete_order == "complete-order":
-            if not transaction_list:
+            if not cart.count():
                 messages.error(request, 'Empty orders')
                 return redirect('transaction-list-forms')
-            #[{'id': 'c9351969-ea58-41b2-8ad1-49be9b31f881', 'user': 1, 'medicine': 105, 'quantity_dispensed': 12, 'dosage': 2, 'remarks': ''}, 
-            # {'id': '1c30cdf1-cd47-4687-a2b0-618ab663857c', 'user': 1, 'medicine': 196, 'quantity_dispensed': 23, 'dosage': 2, 'remarks': ''}, 
-            # {'id': 'c76ed743-2f84-47f4-8f14-4e3233846026', 'user': 1, 'medicine': 106, 'quantity_dispensed': 12, 'dosage': 2, 'remarks': ''}]
             try:
-                with db_transaction.atomic():
-                    
-                    tb = TransactionBatch.objects.create(
-                        user=request.user,
-                        batch_id=TransactionBatch.generate_batch_id()
-                    )
-                    for i in transaction_list:
-                        try:
-                            med = Medicine.objects.get(id=int(i.get("medicine")))
-                        except Medicine.DoesNotExist:
-                            continue
-                        
-
-                        tx = Transaction.objects.create(
-                            batch=tb,
-                            user=request.user,
-                            medicine=med,
-                            quantity_dispensed=i.get("quantity_dispensed"),
-                            status='dispensed'
-                        )
-                        tx.dispense()
-
+                tb = cart.checkout()
             except ValueError:
                 messages.error(request, "Error in saving orders")
                 return redirect('transaction-list-forms')
             messages.success(request, "Order completed successfully")
-            request.session["transactions"] = []
             return redirect('transaction-success-multiple', tb.batch_id)
             
         if remove_id:
-            orders = []
-            for order in transaction_list:
-                if order.get("id") != remove_id:
-                    orders.append(order)
-            request.session["transactions"] = orders
+            cart.remove(remove_id)
             return redirect('transaction-list-forms')
         
-        return render(request, self.template_name, context)
-        
-
-
-        
-        
-        
-        
+        return redirect('transaction-list-forms')